@@ -1,14 +1,25 @@
 import ifcopenshell
+import pandas as pd
 
-def add_property(ifc_file, element, pset_name, prop_name, value):
+# Columns of an edits table, as read by apply_edits
+EDIT_COLUMNS = ["GlobalId", "PropertySet", "Property", "Value"]
+
+def get_or_create_pset(ifc_file, element, pset_name, index=None):
+    """Return the element's property set called `pset_name`, creating it if needed.
+
+    `index` (a ModelIndex) replaces the IsDefinedBy scan and is kept up to date.
+    """
     pset = None
-    for definition in element.IsDefinedBy:
-        if (
-            definition.RelatingPropertyDefinition.is_a("IfcPropertySet")
-            and definition.RelatingPropertyDefinition.Name == pset_name
-        ):
-            pset = definition.RelatingPropertyDefinition
-            break
+    if index is not None:
+        pset = index.property_set(element, pset_name)
+    else:
+        for definition in element.IsDefinedBy:
+            if (
+                definition.RelatingPropertyDefinition.is_a("IfcPropertySet")
+                and definition.RelatingPropertyDefinition.Name == pset_name
+            ):
+                pset = definition.RelatingPropertyDefinition
+                break
 
     if pset is None:
         pset = ifc_file.createIfcPropertySet(
@@ -23,16 +34,157 @@ def add_property(ifc_file, element, pset_name, prop_name, value):
             RelatedObjects=[element],
             RelatingPropertyDefinition=pset,
         )
+        if index is not None:
+            index.add_property_set(element, pset)
+    return pset
 
-    for prop in pset.HasProperties:
-        if prop.Name == prop_name:
-            prop.NominalValue = ifc_file.create_entity("IfcText", str(value))
-            return  # Overwrite
-
+def _new_property(ifc_file, prop_name, value, value_cache):
+    """Create an IfcPropertySingleValue, or reuse the cached one with the same name and value."""
+    value = str(value)
+    if value_cache is not None:
+        prop = value_cache.get((prop_name, value))
+        if prop is not None:
+            return prop
     prop = ifc_file.createIfcPropertySingleValue(
         prop_name,
         None,
-        ifc_file.create_entity("IfcText", str(value)),
+        ifc_file.create_entity("IfcText", value),
         None,
     )
-    pset.HasProperties = list(pset.HasProperties) + [prop]
\ No newline at end of file
+    if value_cache is not None:
+        value_cache[(prop_name, value)] = prop
+    return prop
+
+def _remove_property(ifc_file, prop, value_cache=None, changes=None):
+    """Remove an IfcPropertySingleValue that nothing references any more.
+
+    Its IfcText value is stored inline, so the property is the only entity to go. A removed
+    property is also dropped from `value_cache`, so it is never handed out again.
+    """
+    if not prop.is_a("IfcPropertySingleValue") or ifc_file.get_total_inverses(prop) != 0:
+        return False
+    if value_cache:
+        nominal = prop.NominalValue
+        key = (prop.Name, str(getattr(nominal, "wrappedValue", nominal)))
+        cached = value_cache.get(key)
+        if cached is not None and cached.id() == prop.id():
+            del value_cache[key]
+    if changes is not None:
+        changes.remove(prop.id())
+    ifc_file.remove(prop)
+    return True
+
+def set_properties(ifc_file, element, pset_name, values, replace=False, value_cache=None, index=None, changes=None):
+    """Write several properties into one property set with a single HasProperties assignment.
+
+    `values` maps property names to values (stored as IfcText). With `replace` the set's
+    properties with other names are dropped; otherwise they are kept. Same-named properties are
+    overwritten in place, and left alone when their value is unchanged. Passing the same
+    `value_cache` dict to several calls makes identical (name, value) pairs share one
+    IfcPropertySingleValue across elements, which keeps large mappings small. Shared properties
+    are never modified in place. Dropped or replaced properties that no other set references
+    are removed from the file. Existing entities that are modified or removed are reported to
+    `changes` (a steppatch.ChangeSet), if given.
+    """
+    pset = get_or_create_pset(ifc_file, element, pset_name, index=index)
+    previous = pset.HasProperties or ()
+    properties = [] if replace else list(previous)
+    positions = {prop.Name: i for i, prop in enumerate(properties)}
+    # Reusing a property beats removing it and creating another: removals get slower the
+    # more entities were created in the file before them
+    reusable = {prop.Name: prop for prop in reversed(previous)} if replace else {}
+    for prop_name, value in values.items():
+        i = positions.get(prop_name)
+        existing = properties[i] if i is not None else reusable.get(prop_name)
+        if existing is not None and value_cache is None and existing.is_a("IfcPropertySingleValue") and ifc_file.get_total_inverses(existing) <= 1:
+            nominal = existing.NominalValue
+            if nominal is None or not nominal.is_a("IfcText") or nominal.wrappedValue != str(value):
+                existing.NominalValue = ifc_file.create_entity("IfcText", str(value))  # Overwrite
+                if changes is not None:
+                    changes.modify(existing)
+            prop = existing
+        else:
+            prop = _new_property(ifc_file, prop_name, value, value_cache)
+        if i is None:
+            positions[prop_name] = len(properties)
+            properties.append(prop)
+        else:
+            properties[i] = prop
+    if [prop.id() for prop in properties] != [prop.id() for prop in previous]:
+        pset.HasProperties = properties
+        if changes is not None:
+            changes.modify(pset)
+    kept = {prop.id() for prop in properties}
+    for prop in previous:
+        if prop.id() not in kept:
+            _remove_property(ifc_file, prop, value_cache, changes)
+    return pset
+
+def remove_orphan_properties(ifc_file, changes=None):
+    """Remove property sets and single-value properties that nothing references.
+
+    Such entities are left behind by writers that replace properties without deleting the old
+    ones, and only make the file bigger and slower to open. Property sets go first, so their
+    properties can become orphans too. Returns the number of removed entities per type.
+    """
+    removed = {"IfcPropertySet": 0, "IfcPropertySingleValue": 0}
+    for pset in ifc_file.by_type("IfcPropertySet"):
+        if ifc_file.get_total_inverses(pset) == 0:
+            properties = pset.HasProperties or ()
+            if changes is not None:
+                changes.remove(pset.id())
+            ifc_file.remove(pset)
+            removed["IfcPropertySet"] += 1
+            for prop in properties:
+                removed["IfcPropertySingleValue"] += _remove_property(ifc_file, prop, changes=changes)
+    for prop in ifc_file.by_type("IfcPropertySingleValue"):
+        removed["IfcPropertySingleValue"] += _remove_property(ifc_file, prop, changes=changes)
+    return removed
+
+def add_property(ifc_file, element, pset_name, prop_name, value, index=None, value_cache=None, changes=None):
+    """Add or overwrite a single property; see set_properties."""
+    return set_properties(ifc_file, element, pset_name, {prop_name: value}, index=index, value_cache=value_cache, changes=changes)
+
+def apply_edits(ifc_file, edits, index=None, value_cache=None, changes=None):
+    """Apply a table of property edits, writing each property set once.
+
+    `edits` is a DataFrame with the EDIT_COLUMNS or an iterable of (GlobalId, pset name,
+    property name, value) tuples. Edits are grouped per element and property set (the last
+    value wins for a repeated property) and each group goes through set_properties. Rows with
+    an empty GlobalId, set or property name or value are skipped. Returns a summary dict with
+    the counts and the GlobalIds that are not in the model ("missing").
+    """
+    if isinstance(edits, pd.DataFrame):
+        edits = edits[EDIT_COLUMNS].itertuples(index=False, name=None)
+
+    grouped = {}
+    skipped = 0
+    for global_id, pset_name, prop_name, value in edits:
+        if any(pd.isna(v) or str(v).strip() == "" for v in (global_id, pset_name, prop_name, value)):
+            skipped += 1
+            continue
+        grouped.setdefault((str(global_id).strip(), str(pset_name).strip()), {})[str(prop_name).strip()] = value
+
+    elements = {}
+    missing = []
+    applied = 0
+    for (global_id, pset_name), values in grouped.items():
+        if global_id not in elements:
+            try:
+                elements[global_id] = ifc_file.by_guid(global_id)
+            except RuntimeError:
+                elements[global_id] = None
+                missing.append(global_id)
+        element = elements[global_id]
+        if element is None:
+            continue
+        set_properties(ifc_file, element, pset_name, values, value_cache=value_cache, index=index, changes=changes)
+        applied += len(values)
+
+    return {
+        "properties": applied,
+        "elements": sum(1 for element in elements.values() if element is not None),
+        "property_sets": sum(1 for global_id, _ in grouped if elements[global_id] is not None),
+        "skipped": skipped,
+        "missing": missing,
+    }
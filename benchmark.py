@@ -0,0 +1,180 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import ifcopenshell
+import ifcopenshell.guid
+import pandas as pd
+import addproperty
+import mapper
+from modelindex import ModelIndex
+
+def make_model(path, corridors=1, zones=10, courses=20, techniques=8, seed=0):
+    """Write a synthetic IFC4X3 road model and return the (zone, technique, surface) of every course.
+
+    Each corridor is an IfcRoad with a Baseline IfcRoadPart holding `zones` BaselineRegion parts.
+    Every region contains an IfcPavement aggregating `courses` IfcCourse elements whose
+    "Corridor Shape Information" CodeName is '<technique> - <surface>'.
+    """
+    rng = random.Random(seed)
+    ifc_file = ifcopenshell.file(schema="IFC4X3")
+    new_guid = ifcopenshell.guid.new
+    project = ifc_file.createIfcProject(new_guid(), None, "Benchmark")
+    roads = []
+    keys = []
+    for corridor in range(corridors):
+        road = ifc_file.createIfcRoad(new_guid(), None, f"Corridor {corridor + 1}")
+        roads.append(road)
+        baseline = ifc_file.createIfcRoadPart(new_guid(), None, "Baseline")
+        ifc_file.createIfcRelAggregates(new_guid(), None, None, None, road, [baseline])
+        regions = []
+        for zone in range(zones):
+            zone_name = f"C{corridor + 1}-Z{zone + 1:04d}"
+            region = ifc_file.createIfcRoadPart(new_guid(), None, zone_name, None, "BaselineRegion", PredefinedType="ROADSEGMENT")
+            regions.append(region)
+            pavement = ifc_file.createIfcPavement(new_guid(), None, f"Pavement {zone_name}")
+            ifc_file.createIfcRelContainedInSpatialStructure(new_guid(), None, None, None, [pavement], region)
+            zone_courses = []
+            for number in range(courses):
+                technique = f"Technique {rng.randrange(techniques) + 1}"
+                surface = number * 10
+                course = ifc_file.createIfcCourse(new_guid(), None, f"Course {number + 1}")
+                code_name = ifc_file.createIfcPropertySingleValue("CodeName", None, ifc_file.create_entity("IfcLabel", f"{technique} - {surface}"), None)
+                pset = ifc_file.createIfcPropertySet(new_guid(), None, "Corridor Shape Information", None, [code_name])
+                ifc_file.createIfcRelDefinesByProperties(new_guid(), None, None, None, [course], pset)
+                zone_courses.append(course)
+                keys.append((zone_name, technique, surface))
+            ifc_file.createIfcRelAggregates(new_guid(), None, None, None, pavement, zone_courses)
+        ifc_file.createIfcRelAggregates(new_guid(), None, None, None, baseline, regions)
+    ifc_file.createIfcRelAggregates(new_guid(), None, None, None, project, roads)
+    ifc_file.write(path)
+    return keys
+
+def make_table(path, keys, hit_rate=0.9, seed=0):
+    """Write an Excel (or CSV/Parquet) sheet with a row for `hit_rate` of the courses plus non-matching rows."""
+    rng = random.Random(seed)
+    rows = []
+    for zone, technique, surface in keys:
+        hit = rng.random() < hit_rate
+        rows.append({
+            "ZONE": zone,
+            # Vary case and spacing so key normalization does real work
+            "TECHNIQUE_": technique.upper().replace(" ", "  ") if hit else f"Unknown {technique}",
+            "SURFACE": float(surface) if surface % 20 else surface,
+            "PR_1": rng.randrange(1000),
+            "PR_2": rng.randrange(1000),
+            "FOND": f"F{rng.randrange(5)}",
+            "TYPE_COUCH": f"Layer {rng.randrange(4)}",
+            "CHANTIER": "Benchmark",
+            "ENTREPRISE": f"Company {rng.randrange(3)}",
+            "DATE_MS": f"2024-{rng.randrange(12) + 1:02d}-01",
+            "N°_ORDRE": rng.randrange(100000),
+        })
+    df = pd.DataFrame(rows)
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        df.to_csv(path, index=False)
+    elif ext == ".parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_excel(path, index=False)
+
+def time_run_mapping(ifc_path, table_path, output_path, log_path, workers=1, trace_memory=False):
+    """Run mapper.run_mapping and return its metrics report (per-stage times, memory and counts)."""
+    reports = []
+    mapper.run_mapping(
+        ifc_path, table_path, output_path,
+        lambda current, total, info: None, lambda message: None, threading.Event(), log_path, lambda: None,
+        log_level=mapper.LOG_SUMMARY, workers=workers, metrics_callback=reports.append, trace_memory=trace_memory,
+    )
+    return reports[0]
+
+def time_add_property(ifc_path, count=1000, seed=0):
+    """Time `count` single add_property calls on random courses, with and without a ModelIndex."""
+    rng = random.Random(seed)
+    timings = {}
+    for use_index in (False, True):
+        ifc_file = ifcopenshell.open(ifc_path)
+        courses = ifc_file.by_type("IfcCourse")
+        index = ModelIndex(ifc_file) if use_index else None
+        start_time = time.perf_counter()
+        for i in range(count):
+            course = rng.choice(courses)
+            addproperty.add_property(ifc_file, course, "Benchmark", f"Property {i % 10}", str(i), index=index)
+        timings["add_property_indexed" if use_index else "add_property"] = (time.perf_counter() - start_time) / count
+    return timings
+
+def parse_sizes(text):
+    return [int(value) for value in text.split(",") if value.strip()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the IFC-Excel mapper on synthetic corridor models.")
+    parser.add_argument("--corridors", type=parse_sizes, default=[1], help="comma-separated corridor counts (default: 1)")
+    parser.add_argument("--zones", type=parse_sizes, default=[10, 100], help="comma-separated BaselineRegion zones per corridor (default: 10,100)")
+    parser.add_argument("--courses", type=parse_sizes, default=[20], help="comma-separated courses per zone (default: 20)")
+    parser.add_argument("--techniques", type=int, default=8, help="distinct CodeName techniques (default: 8)")
+    parser.add_argument("--hit-rate", type=float, default=0.9, help="fraction of courses with a matching Excel row (default: 0.9)")
+    parser.add_argument("--format", choices=["xlsx", "csv", "parquet"], default="xlsx", help="table format (default: xlsx)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per size, each reported separately (default: 1)")
+    parser.add_argument("--workers", type=int, default=1, help="zone worker processes for run_mapping (default: 1)")
+    parser.add_argument("--trace-memory", action="store_true", help="also report tracemalloc peaks per stage (slower)")
+    parser.add_argument("--add-property-calls", type=int, default=1000, help="add_property calls to time per size (default: 1000, 0 to skip)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="append JSON lines to this file instead of printing them")
+    parser.add_argument("--keep", metavar="DIR", help="write the generated models and tables to DIR and keep them")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    temp_dir = None
+    if args.keep:
+        work_dir = args.keep
+        os.makedirs(work_dir, exist_ok=True)
+    else:
+        temp_dir = tempfile.TemporaryDirectory(prefix="mapper-benchmark-")
+        work_dir = temp_dir.name
+    try:
+        for corridors, zones, courses in itertools.product(args.corridors, args.zones, args.courses):
+            name = f"c{corridors}_z{zones}_n{courses}"
+            ifc_path = os.path.join(work_dir, f"{name}.ifc")
+            table_path = os.path.join(work_dir, f"{name}.{args.format}")
+            start_time = time.perf_counter()
+            keys = make_model(ifc_path, corridors, zones, courses, args.techniques, args.seed)
+            make_table(table_path, keys, args.hit_rate, args.seed)
+            generate_seconds = time.perf_counter() - start_time
+
+            for run in range(args.repeat):
+                report = time_run_mapping(ifc_path, table_path, os.path.join(work_dir, f"{name}_mapped.ifc"), os.path.join(work_dir, f"{name}_log.txt"), args.workers, args.trace_memory)
+                result = {
+                    "corridors": corridors,
+                    "zones": zones * corridors,
+                    "courses": len(keys),
+                    "hit_rate": args.hit_rate,
+                    "format": args.format,
+                    "run": run + 1,
+                    "ifc_bytes": os.path.getsize(ifc_path),
+                    "generate_seconds": generate_seconds,
+                    "workers": args.workers,
+                    "status": report["status"],
+                    "run_mapping_seconds": report["total_wall_seconds"],
+                    "stages": report["stages"],
+                    "counts": report["counts"],
+                    "peak_rss_bytes": report["peak_rss_bytes"],
+                }
+                if args.add_property_calls:
+                    result.update(time_add_property(ifc_path, args.add_property_calls, args.seed))
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if temp_dir is not None:
+            temp_dir.cleanup()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+import argparse
+import concurrent.futures
+import csv
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+import mapper
+import progress
+
+# Seconds between a job's progress lines; a new stage is always reported
+CLI_PROGRESS_INTERVAL = 5.0
+
+def load_manifest(manifest_path, compress=False):
+    """Read mapping jobs from a CSV (columns ifc, excel, output) or JSON (list of objects) manifest.
+
+    Relative paths are resolved against the manifest's folder. The output column is optional and
+    defaults to '<ifc>_mapped.ifc', as in the GUI, or '<ifc>_mapped.ifcZIP' with `compress`.
+    The optional name column names the job in the console, the log file and the summary; it
+    defaults to the entry number and IFC file name ('002_site'). Names must be unique.
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    if manifest_path.lower().endswith(".json"):
+        with open(manifest_path, encoding="utf-8") as f:
+            entries = json.load(f)
+    else:
+        with open(manifest_path, newline="", encoding="utf-8-sig") as f:
+            entries = list(csv.DictReader(f))
+
+    jobs = []
+    numbers = {}
+    for number, entry in enumerate(entries, start=1):
+        entry = {str(k).strip().lower(): (str(v).strip() if v is not None else "") for k, v in entry.items()}
+        if not entry.get("ifc") or not entry.get("excel"):
+            raise ValueError(f"Manifest entry {number} needs both 'ifc' and 'excel' paths")
+        ifc_path = os.path.join(base_dir, entry["ifc"])
+        excel_path = os.path.join(base_dir, entry["excel"])
+        if entry.get("output"):
+            output_path = os.path.join(base_dir, entry["output"])
+        else:
+            base, ext = os.path.splitext(ifc_path)
+            output_path = f"{base}_mapped{'.ifcZIP' if compress else ext}"
+        name = entry.get("name") or f"{number:03d}_{os.path.splitext(os.path.basename(ifc_path))[0]}"
+        if name in numbers:
+            raise ValueError(f"Manifest entries {numbers[name]} and {number} are both named '{name}'")
+        numbers[name] = number
+        jobs.append({
+            "name": name,
+            "ifc": ifc_path,
+            "excel": excel_path,
+            "output": output_path,
+        })
+    return jobs
+
+def run_job(job, log_level=mapper.LOG_ZONE, log_dir=None, zone_workers=1, share_values=False, incremental_mode=False, patch_output=False, preview=False, suggest=0, auto_accept=None, compact=False):
+    """Run one mapping job headless and report its outcome. Runs inside a worker process.
+
+    With preview nothing is written except the match plan, saved as '<output>_preview.csv'.
+
+    With incremental_mode the job's previous output is updated in place of the source IFC,
+    provided its mapping manifest is still valid and it was mapped from this very IFC file
+    (see incremental.choose_source).
+    """
+    name = job["name"]
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    log_file = os.path.join(log_dir or os.path.dirname(job["output"]) or ".", f"mapping_log_{name}_{timestamp}.txt")
+
+    last_report = [None, None]  # Time and stage of the last progress line
+
+    def progress_callback(current, total, info):
+        now = time.monotonic()
+        if info["stage"] == last_report[1] and now - last_report[0] < CLI_PROGRESS_INTERVAL and current < total:
+            return
+        last_report[:] = [now, info["stage"]]
+        print(f"[{name}] progress {info['percent']:.1f}%: {progress.describe(info)}", flush=True)
+
+    def status_callback(message):
+        print(f"[{name}] {message}", flush=True)
+
+    result = {"name": name, "output": job["output"], "log_file": log_file, "updated": 0, "error": None}
+    start_time = time.time()
+    try:
+        updated = mapper.run_mapping(
+            job["ifc"], job["excel"], job["output"],
+            progress_callback, status_callback, threading.Event(), log_file, lambda: None,
+            log_level=log_level, workers=zone_workers, share_values=share_values,
+            incremental_mode=incremental_mode,
+            patch_output=patch_output, preview=preview, suggest=suggest, auto_accept=auto_accept, compact=compact,
+        )
+        if preview and updated is not None:
+            plan_path = os.path.splitext(job["output"])[0] + "_preview.csv"
+            updated.to_csv(plan_path, index=False, encoding="utf-8-sig")
+            status_callback(f"Match plan written to {plan_path}")
+            updated = int(updated["status"].isin(["matched", "accepted"]).sum())
+        result["updated"] = updated or 0
+        result["status"] = "ok"
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = str(e)
+        print(f"[{name}] Error: {e}", flush=True)
+    result["seconds"] = time.time() - start_time
+    return result
+
+def print_summary(results):
+    print("")
+    print(f"{'Job':<30} {'Status':<8} {'Updated':>8} {'Seconds':>9}")
+    for result in results:
+        print(f"{result['name'][:30]:<30} {result['status']:<8} {result['updated']:>8} {result['seconds']:>9.1f}")
+        if result["error"]:
+            print(f"    {result['error']}")
+    failed = sum(1 for result in results if result["status"] != "ok")
+    print(f"{len(results) - failed} of {len(results)} jobs succeeded, "
+          f"{sum(result['updated'] for result in results)} IfcCourse elements updated in total")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Map Excel layer data onto IFC files without the GUI.")
+    parser.add_argument("manifest", help="CSV or JSON manifest listing ifc, excel and (optionally) output paths")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="number of jobs to run in parallel (default: number of CPUs)")
+    parser.add_argument("--log-level", choices=list(mapper.LOG_LEVELS), default="zone",
+                        help="detail of the per-job log file (default: zone)")
+    parser.add_argument("--log-dir", help="folder for the log files (default: next to each output)")
+    parser.add_argument("--zone-workers", type=int, default=1,
+                        help="processes matching zones within each job (default: 1, jobs already run in parallel)")
+    parser.add_argument("--compress", action="store_true",
+                        help="save outputs without an explicit path as .ifcZIP (an output ending in .ifcZIP is always compressed)")
+    parser.add_argument("--share-values", action="store_true",
+                        help="let courses with identical Excel values share property entities (smaller output)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="update each job's previous output with only the Excel rows changed since it was written")
+    parser.add_argument("--patch-output", action="store_true",
+                        help="write outputs by patching the input file instead of re-serializing the whole model")
+    parser.add_argument("--preview", action="store_true",
+                        help="only match: write each job's match plan to '<output>_preview.csv' and leave the IFC files alone")
+    parser.add_argument("--suggest", type=int, default=0, metavar="K",
+                        help="list up to K near-matching CodeNames per unmatched row in '<output>_suggestions.csv'")
+    parser.add_argument("--auto-accept", type=float, metavar="SCORE",
+                        help="with --suggest, map rows whose best suggestion scores at least SCORE (0-1) onto it")
+    parser.add_argument("--compact", action="store_true",
+                        help="remove property sets and properties that nothing references before saving")
+    args = parser.parse_args(argv)
+
+    try:
+        jobs = load_manifest(args.manifest, compress=args.compress)
+    except (OSError, ValueError) as e:
+        print(f"Error reading manifest: {e}", file=sys.stderr)
+        return 2
+    if not jobs:
+        print("Manifest contains no jobs.", file=sys.stderr)
+        return 2
+
+    log_level = mapper.LOG_LEVELS[args.log_level]
+    workers = max(1, min(args.jobs, len(jobs)))
+    print(f"Running {len(jobs)} job(s) with {workers} worker(s)", flush=True)
+    results = [None] * len(jobs)
+    done = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_job, job, log_level, args.log_dir, args.zone_workers, args.share_values, args.incremental, args.patch_output, args.preview, args.suggest, args.auto_accept, args.compact): i for i, job in enumerate(jobs)}
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                i = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:  # The worker process itself died
+                    result = {"name": jobs[i]["name"], "output": jobs[i]["output"], "log_file": None,
+                              "updated": 0, "status": "failed", "error": str(e), "seconds": 0.0}
+                results[i] = result
+                done += 1
+                print(f"[{result['name']}] {result['status']} ({done}/{len(jobs)} jobs done)", flush=True)
+        except KeyboardInterrupt:
+            executor.shutdown(wait=False, cancel_futures=True)
+            print("Interrupted; pending jobs cancelled.", file=sys.stderr)
+            return 130
+
+    print_summary(results)
+    return 0 if all(result["status"] == "ok" for result in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,24 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import ifcopenshell
 import addproperty
 import mapper
+import worker
+from progress import describe
+from modelindex import ModelIndex
+import ifcio
+from modelcache import ModelCache
+from statuschannel import StatusChannel
+from tableloader import load_table
 import os
 import threading
-import queue
 import subprocess
 import datetime
 
+# Status box lines kept on screen; older lines scroll out so long runs stay responsive
+STATUS_MAX_LINES = 2000
+# Near-match CodeNames listed per unmatched row when suggestions are on
+SUGGESTIONS_PER_ROW = 3
+
 def start_gui():
     root = tk.Tk()
     root.title("IFC-Excel Mapper")
@@ -72,7 +82,7 @@ def start_gui():
     excel_entry = ttk.Entry(left_frame, textvariable=excel_path_var, width=50)  # Increased width for long paths
     excel_entry.grid(row=2, column=1, pady=5, padx=5, sticky="ew")
     def browse_excel():
-        path = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsx *.xls")])
+        path = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsx *.xlsm *.xls"), ("CSV files", "*.csv"), ("Parquet files", "*.parquet")])
         if path:
             excel_path_var.set(path)
     excel_button = ttk.Button(left_frame, text="Browse", command=browse_excel)
@@ -101,7 +111,7 @@ def start_gui():
     def browse_output():
         path = filedialog.asksaveasfilename(
             defaultextension=".ifc",
-            filetypes=[("IFC files", "*.ifc")],
+            filetypes=[("IFC files", "*.ifc"), ("Compressed IFC files", "*.ifcZIP")],
             initialfile=os.path.basename(output_path_var.get())
         )
         if path:
@@ -109,18 +119,49 @@ def start_gui():
     output_button = ttk.Button(left_frame, text="Browse", command=browse_output)
     output_button.grid(row=4, column=2, pady=5, padx=5)
 
+    # Log detail selection
+    log_level_label = ttk.Label(left_frame, text="Log Detail:")
+    log_level_label.grid(row=5, column=0, sticky="w", pady=5)
+    options_frame = ttk.Frame(left_frame)
+    options_frame.grid(row=5, column=1, columnspan=2, sticky="w")
+    log_level_var = tk.StringVar(value="zone")
+    log_level_dropdown = ttk.Combobox(options_frame, textvariable=log_level_var, values=list(mapper.LOG_LEVELS), state="readonly", width=17)
+    log_level_dropdown.grid(row=0, column=0, pady=5, padx=5, sticky="w")
+    share_values_var = tk.BooleanVar(value=False)
+    share_values_check = ttk.Checkbutton(options_frame, text="Share identical values", variable=share_values_var)
+    share_values_check.grid(row=0, column=1, pady=5, padx=(15, 5), sticky="w")
+    incremental_var = tk.BooleanVar(value=False)
+    incremental_check = ttk.Checkbutton(options_frame, text="Incremental (changed rows only)", variable=incremental_var)
+    incremental_check.grid(row=0, column=2, pady=5, padx=5, sticky="w")
+    suggest_var = tk.BooleanVar(value=False)
+    suggest_check = ttk.Checkbutton(options_frame, text="Suggest near matches", variable=suggest_var)
+    suggest_check.grid(row=1, column=0, pady=(0, 5), padx=5, sticky="w")
+    # Off by default: only in-process runs share parsed models through the ModelCache, a separate
+    # process parses the IFC again every run in exchange for an instant abort
+    separate_process_var = tk.BooleanVar(value=False)
+    separate_process_check = ttk.Checkbutton(options_frame, text="Run in separate process (instant abort)", variable=separate_process_var)
+    separate_process_check.grid(row=1, column=1, columnspan=2, pady=(0, 5), padx=(15, 5), sticky="w")
+    patch_output_var = tk.BooleanVar(value=False)
+    patch_output_check = ttk.Checkbutton(options_frame, text="Fast save (patch the input file)", variable=patch_output_var)
+    patch_output_check.grid(row=2, column=1, columnspan=2, pady=(0, 5), padx=(15, 5), sticky="w")
+    compact_var = tk.BooleanVar(value=False)
+    compact_check = ttk.Checkbutton(options_frame, text="Remove orphaned properties", variable=compact_var)
+    compact_check.grid(row=2, column=0, pady=(0, 5), padx=5, sticky="w")
+
     # Progress bar and percentage label in left frame
     progress_frame = ttk.Frame(left_frame)
-    progress_frame.grid(row=5, column=0, columnspan=3, pady=(20, 10), sticky="ew")
+    progress_frame.grid(row=6, column=0, columnspan=3, pady=(20, 10), sticky="ew")
     progress_var = tk.DoubleVar()
     progress_bar = ttk.Progressbar(progress_frame, variable=progress_var, maximum=100, length=400)
     progress_bar.grid(row=0, column=0, sticky="ew")
     percentage_label = ttk.Label(progress_frame, text="0.0%", font=("Helvetica", 10))
     percentage_label.grid(row=0, column=1, padx=10)
+    eta_label = ttk.Label(progress_frame, text="", font=("Helvetica", 10))  # Stage, throughput and ETA
+    eta_label.grid(row=0, column=2, sticky="w")
 
     # Status text box with scrollbar in left frame (Report box)
     status_frame = ttk.Frame(left_frame)
-    status_frame.grid(row=6, column=0, columnspan=3, pady=(10, 10), sticky="nsew")
+    status_frame.grid(row=7, column=0, columnspan=3, pady=(10, 10), sticky="nsew")
     status_text = tk.Text(status_frame, height=10, width=70, font=("Helvetica", 10), wrap="word", bg="#ffffff", relief="flat", borderwidth=1)  # Increased size
     status_text.grid(row=0, column=0, sticky="nsew")
     status_scrollbar = ttk.Scrollbar(status_frame, orient="vertical", command=status_text.yview)
@@ -130,22 +171,25 @@ def start_gui():
     status_text.insert("end", "Ready\n")
     status_text.configure(state="disabled")
 
-    # Buttons frame for Run, Abort, and About in left frame
+    # Buttons frame for Run, Preview, Abort, and About in left frame
     button_frame = ttk.Frame(left_frame)
-    button_frame.grid(row=7, column=0, columnspan=3, pady=10, sticky="ew")
+    button_frame.grid(row=8, column=0, columnspan=3, pady=10, sticky="ew")
     run_button = ttk.Button(button_frame, text="Run Mapping")
     run_button.grid(row=0, column=0, padx=(0, 5))
+    preview_button = ttk.Button(button_frame, text="Preview")
+    preview_button.grid(row=0, column=1, padx=(5, 5))
     abort_button = ttk.Button(button_frame, text="Abort", state="disabled")
-    abort_button.grid(row=0, column=1, padx=(5, 5))
+    abort_button.grid(row=0, column=2, padx=(5, 5))
     about_button = ttk.Button(button_frame, text="?", command=lambda: show_about())
-    about_button.grid(row=0, column=2, padx=(5, 0))
+    about_button.grid(row=0, column=3, padx=(5, 0))
     button_frame.columnconfigure(0, weight=1)
     button_frame.columnconfigure(1, weight=1)
     button_frame.columnconfigure(2, weight=1)
+    button_frame.columnconfigure(3, weight=1)
 
     # Configure grid weights for left frame
     left_frame.columnconfigure(1, weight=1)
-    left_frame.rowconfigure(6, weight=1)  # Ensure status text box expands
+    left_frame.rowconfigure(7, weight=1)  # Ensure status text box expands
     progress_frame.columnconfigure(0, weight=1)
     status_frame.columnconfigure(0, weight=1)
     status_frame.rowconfigure(0, weight=1)
@@ -164,16 +208,22 @@ def start_gui():
         )
         messagebox.showinfo("About IFC-Excel Mapper", about_text, parent=root)
 
-    # Queue for thread-safe updates
-    update_queue = queue.Queue()
+    # Thread-safe hand-off of progress, status and completion from the mapping thread
+    status_channel = StatusChannel(max_lines=STATUS_MAX_LINES)
     cancel_event = threading.Event()
+    mapping_process = None
 
     # Right frame for add property module
     title_label_right = ttk.Label(right_frame, text="Add Property to Element", font=("Helvetica", 14, "bold"))
     title_label_right.grid(row=0, column=0, columnspan=2, pady=(0, 20), sticky="ew")
 
+    # Parsed models shared by the Add Property panel and mapping runs
+    model_cache = ModelCache()
+
     # Load Zones button
     ifc_file = None
+    model_index = None
+    panel_lease = None
     zone_dropdown_var = tk.StringVar()
     course_dropdown_var = tk.StringVar()
     pset_dropdown_var = tk.StringVar()
@@ -181,36 +231,38 @@ def start_gui():
     prop_value_var = tk.StringVar()
 
     def load_zones():
-        nonlocal ifc_file
+        nonlocal ifc_file, model_index, panel_lease
         ifc_path = ifc_path_var.get()
         if not ifc_path:
             messagebox.showerror("Error", "Please select IFC file first.", parent=root)
             return
         try:
-            ifc_file = ifcopenshell.open(ifc_path)
-            zones = []
-            corridors = ifc_file.by_type("IfcRoad") or ifc_file.by_type("IfcFacility")
-            for corridor in corridors:
-                if hasattr(corridor, "IsDecomposedBy"):
-                    for rel in corridor.IsDecomposedBy:
-                        if hasattr(rel, "RelatedObjects"):
-                            for baseline in rel.RelatedObjects:
-                                if hasattr(baseline, "IsDecomposedBy"):
-                                    for sub_rel in baseline.IsDecomposedBy:
-                                        if hasattr(sub_rel, "RelatedObjects"):
-                                            for region in sub_rel.RelatedObjects:
-                                                if (
-                                                    region.is_a("IfcRoadPart") and
-                                                    getattr(region, "PredefinedType", None) == "ROADSEGMENT" and
-                                                    getattr(region, "ObjectType", None) == "BaselineRegion"
-                                                ):
-                                                    zones.append(str(getattr(region, "Name", "N/A")).strip())
+            if panel_lease is not None:
+                if panel_lease.dirty and not messagebox.askyesno("Unsaved Changes", "Discard the properties added to the loaded IFC file?", parent=root):
+                    return
+                model_cache.release(panel_lease)
+                panel_lease = ifc_file = model_index = None
+            panel_lease = model_cache.lease(ifc_path)
+            ifc_file = panel_lease.ifc_file
+            model_index = ModelIndex(ifc_file)  # Zone, course and pset lookups for the dropdowns below
+            zones = sorted(model_index.zone_to_region)
             zone_dropdown_var.set("Select Zone")
-            zone_dropdown['values'] = sorted(zones)
+            zone_dropdown['values'] = zones
             messagebox.showinfo("Success", f"Loaded {len(zones)} zones.", parent=root)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load zones: {str(e)}", parent=root)
 
+    def current_model():
+        """Re-lease the panel's file if a mapping run took its (unmodified) model over."""
+        nonlocal ifc_file, model_index, panel_lease
+        if panel_lease is not None and panel_lease.revoked:
+            path = panel_lease.path
+            model_cache.release(panel_lease)
+            panel_lease = model_cache.lease(path)
+            ifc_file = panel_lease.ifc_file
+            model_index = ModelIndex(ifc_file)
+        return ifc_file
+
     load_zones_button = ttk.Button(right_frame, text="Load Zones", command=load_zones)
     load_zones_button.grid(row=1, column=0, columnspan=2, pady=5)
 
@@ -246,8 +298,7 @@ def start_gui():
 
     # Add Property button
     def add_property():
-        nonlocal ifc_file
-        if not ifc_file:
+        if not current_model():
             messagebox.showerror("Error", "Load IFC file first.", parent=root)
             return
         zone = zone_dropdown_var.get()
@@ -258,53 +309,16 @@ def start_gui():
         if not zone or zone == "Select Zone" or not course_name or course_name == "Select Technique" or not pset_name or pset_name == "Select Property Set" or not prop_name or not value:
             messagebox.showerror("Error", "Fill all fields.", parent=root)
             return
-        region = None
-        corridors = ifc_file.by_type("IfcRoad") or ifc_file.by_type("IfcFacility")
-        for corridor in corridors:
-            if hasattr(corridor, "IsDecomposedBy"):
-                for rel in corridor.IsDecomposedBy:
-                    if hasattr(rel, "RelatedObjects"):
-                        for baseline in rel.RelatedObjects:
-                            if hasattr(baseline, "IsDecomposedBy"):
-                                for sub_rel in baseline.IsDecomposedBy:
-                                    if hasattr(sub_rel, "RelatedObjects"):
-                                        for r in sub_rel.RelatedObjects:
-                                            if (
-                                                r.is_a("IfcRoadPart") and
-                                                getattr(r, "PredefinedType", None) == "ROADSEGMENT" and
-                                                getattr(r, "ObjectType", None) == "BaselineRegion" and
-                                                str(getattr(r, "Name", "N/A")).strip() == zone
-                                            ):
-                                                region = r
-                                                break
-                            if hasattr(baseline, "ContainsElements"):
-                                for sub_rel in baseline.ContainsElements:
-                                    if sub_rel.is_a("IfcRelContainedInSpatialStructure") and hasattr(sub_rel, "RelatedElements"):
-                                        for r in sub_rel.RelatedElements:
-                                            if (
-                                                r.is_a("IfcRoadPart") and
-                                                getattr(r, "PredefinedType", None) == "ROADSEGMENT" and
-                                                getattr(r, "ObjectType", None) == "BaselineRegion" and
-                                                str(getattr(r, "Name", "N/A")).strip() == zone
-                                            ):
-                                                region = r
-                                                break
-                            if region:
-                                break
-                        if region:
-                            break
-                    if region:
-                        break
-        if not region:
+        if zone not in model_index.zone_to_region:
             messagebox.showerror("Error", f"Zone '{zone}' not found.", parent=root)
             return
-        courses = find_course_elements_recursively(region)
-        course = next((c for c in courses if c.Name == course_name), None)
+        course = model_index.courses_by_name(zone).get(course_name)
         if not course:
             messagebox.showerror("Error", f"Technique '{course_name}' not found.", parent=root)
             return
         try:
-            addproperty.add_property(ifc_file, course, pset_name, prop_name, value)
+            addproperty.add_property(ifc_file, course, pset_name, prop_name, value, index=model_index)
+            model_cache.mark_dirty(panel_lease)
             messagebox.showinfo("Success", f"Property '{prop_name}' added/overwritten in '{pset_name}' for Technique '{course_name}'.", parent=root)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to add property: {str(e)}", parent=root)
@@ -314,14 +328,14 @@ def start_gui():
 
     # Save IFC button
     def save_ifc():
-        nonlocal ifc_file
-        if not ifc_file:
+        if not current_model():
             messagebox.showerror("Error", "Load IFC file first.", parent=root)
             return
-        save_path = filedialog.asksaveasfilename(defaultextension=".ifc", filetypes=[("IFC files", "*.ifc")])
+        save_path = filedialog.asksaveasfilename(defaultextension=".ifc", filetypes=[("IFC files", "*.ifc"), ("Compressed IFC files", "*.ifcZIP")])
         if save_path:
             try:
-                ifc_file.write(save_path)
+                ifcio.save_ifc(ifc_file, save_path)
+                model_cache.mark_saved(panel_lease, save_path)
                 messagebox.showinfo("Success", f"IFC file saved to {save_path}.", parent=root)
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to save IFC file: {str(e)}", parent=root)
@@ -329,189 +343,119 @@ def start_gui():
     save_ifc_button = ttk.Button(right_frame, text="Save Updated IFC", command=save_ifc)
     save_ifc_button.grid(row=8, column=0, columnspan=2, pady=5)
 
-    # Zone dropdown selection handler
-    def find_course_elements_recursively(current_element, depth=0):
-        found_courses = []
-        if hasattr(current_element, "IsDecomposedBy"):
-            for rel in current_element.IsDecomposedBy:
-                if hasattr(rel, "RelatedObjects"):
-                    for obj in rel.RelatedObjects:
-                        if obj.is_a("IfcCourse"):
-                            found_courses.append(obj)
-                        elif obj.is_a("IfcPavement") or obj.is_a("IfcRoadPart") or obj.is_a("IfcElement"):
-                            found_courses.extend(find_course_elements_recursively(obj, depth + 1))
-        if hasattr(current_element, "ContainsElements"):
-            for rel in current_element.ContainsElements:
-                if rel.is_a("IfcRelContainedInSpatialStructure") and hasattr(rel, "RelatedElements"):
-                    for obj in rel.RelatedElements:  # Fixed: RelatedObjects -> RelatedElements
-                        if obj.is_a("IfcCourse"):
-                            found_courses.append(obj)
-                        elif obj.is_a("IfcPavement") or obj.is_a("IfcRoadPart") or obj.is_a("IfcElement"):
-                            found_courses.extend(find_course_elements_recursively(obj, depth + 1))
-        return found_courses
+    # Import a table of edits (GlobalId, PropertySet, Property, Value) in one pass
+    def import_edits():
+        if not current_model():
+            messagebox.showerror("Error", "Load IFC file first.", parent=root)
+            return
+        path = filedialog.askopenfilename(filetypes=[("Excel files", "*.xlsx *.xlsm *.xls"), ("CSV files", "*.csv"), ("Parquet files", "*.parquet")])
+        if not path:
+            return
+        try:
+            edits = load_table(path, addproperty.EDIT_COLUMNS, required=addproperty.EDIT_COLUMNS)
+            summary = addproperty.apply_edits(ifc_file, edits, index=model_index)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to import edits: {str(e)}", parent=root)
+            return
+        if summary["properties"]:
+            model_cache.mark_dirty(panel_lease)
+        message = f"Applied {summary['properties']} properties to {summary['elements']} elements ({summary['property_sets']} property sets)."
+        if summary["skipped"]:
+            message += f"\nSkipped {summary['skipped']} incomplete rows."
+        if summary["missing"]:
+            message += f"\n{len(summary['missing'])} GlobalIds not found, e.g. {', '.join(summary['missing'][:5])}."
+        messagebox.showinfo("Import Edits", message, parent=root)
+
+    import_edits_button = ttk.Button(right_frame, text="Import Edits...", command=import_edits)
+    import_edits_button.grid(row=9, column=0, columnspan=2, pady=5)
 
+    # Zone dropdown selection handler
     def on_zone_select(event):
-        nonlocal ifc_file
         zone = zone_dropdown_var.get()
-        if zone == "Select Zone":
+        current_model()
+        if zone == "Select Zone" or model_index is None:
             technique_dropdown['values'] = []
             course_dropdown_var.set("Select Technique")
             return
-        region = None
-        corridors = ifc_file.by_type("IfcRoad") or ifc_file.by_type("IfcFacility")
-        for corridor in corridors:
-            if hasattr(corridor, "IsDecomposedBy"):
-                for rel in corridor.IsDecomposedBy:
-                    if hasattr(rel, "RelatedObjects"):
-                        for baseline in rel.RelatedObjects:
-                            if hasattr(baseline, "IsDecomposedBy"):
-                                for sub_rel in baseline.IsDecomposedBy:
-                                    if hasattr(sub_rel, "RelatedObjects"):
-                                        for r in sub_rel.RelatedObjects:
-                                            if (
-                                                r.is_a("IfcRoadPart") and
-                                                getattr(r, "PredefinedType", None) == "ROADSEGMENT" and
-                                                getattr(r, "ObjectType", None) == "BaselineRegion" and
-                                                str(getattr(r, "Name", "N/A")).strip() == zone
-                                            ):
-                                                region = r
-                                                break
-                            if hasattr(baseline, "ContainsElements"):
-                                for sub_rel in baseline.ContainsElements:
-                                    if sub_rel.is_a("IfcRelContainedInSpatialStructure") and hasattr(sub_rel, "RelatedElements"):
-                                        for r in sub_rel.RelatedElements:
-                                            if (
-                                                r.is_a("IfcRoadPart") and
-                                                getattr(r, "PredefinedType", None) == "ROADSEGMENT" and
-                                                getattr(r, "ObjectType", None) == "BaselineRegion" and
-                                                str(getattr(r, "Name", "N/A")).strip() == zone
-                                            ):
-                                                region = r
-                                                break
-                            if region:
-                                break
-                        if region:
-                            break
-                    if region:
-                        break
-        if region:
-            courses = find_course_elements_recursively(region)
-            course_names = [c.Name for c in courses if c.Name]
-            technique_dropdown['values'] = sorted(course_names)
-            course_dropdown_var.set("Select Technique")
-        else:
-            technique_dropdown['values'] = []
-            course_dropdown_var.set("Select Technique")
+        technique_dropdown['values'] = sorted(model_index.courses_by_name(zone))
+        course_dropdown_var.set("Select Technique")
 
     zone_dropdown.bind("<<ComboboxSelected>>", on_zone_select)
 
     # Technique dropdown selection handler
     def on_technique_select(event):
-        nonlocal ifc_file
         zone = zone_dropdown_var.get()
         course_name = course_dropdown_var.get()
-        if course_name == "Select Technique":
-            pset_dropdown['values'] = []
-            pset_dropdown_var.set("Select Property Set")
-            return
-        region = None
-        corridors = ifc_file.by_type("IfcRoad") or ifc_file.by_type("IfcFacility")
-        for corridor in corridors:
-            if hasattr(corridor, "IsDecomposedBy"):
-                for rel in corridor.IsDecomposedBy:
-                    if hasattr(rel, "RelatedObjects"):
-                        for baseline in rel.RelatedObjects:
-                            if hasattr(baseline, "IsDecomposedBy"):
-                                for sub_rel in baseline.IsDecomposedBy:
-                                    if hasattr(sub_rel, "RelatedObjects"):
-                                        for r in sub_rel.RelatedObjects:
-                                            if (
-                                                r.is_a("IfcRoadPart") and
-                                                getattr(r, "PredefinedType", None) == "ROADSEGMENT" and
-                                                getattr(r, "ObjectType", None) == "BaselineRegion" and
-                                                str(getattr(r, "Name", "N/A")).strip() == zone
-                                            ):
-                                                region = r
-                                                break
-                            if hasattr(baseline, "ContainsElements"):
-                                for sub_rel in baseline.ContainsElements:
-                                    if sub_rel.is_a("IfcRelContainedInSpatialStructure") and hasattr(sub_rel, "RelatedElements"):
-                                        for r in sub_rel.RelatedElements:
-                                            if (
-                                                r.is_a("IfcRoadPart") and
-                                                getattr(r, "PredefinedType", None) == "ROADSEGMENT" and
-                                                getattr(r, "ObjectType", None) == "BaselineRegion" and
-                                                str(getattr(r, "Name", "N/A")).strip() == zone
-                                            ):
-                                                region = r
-                                                break
-                            if region:
-                                break
-                        if region:
-                            break
-                    if region:
-                        break
-        if region:
-            courses = find_course_elements_recursively(region)
-            course = next((c for c in courses if c.Name == course_name), None)
-            if course:
-                psets = []
-                for definition in course.IsDefinedBy:
-                    if definition.RelatingPropertyDefinition.is_a("IfcPropertySet"):
-                        psets.append(definition.RelatingPropertyDefinition.Name)
-                pset_dropdown['values'] = sorted(psets)
-                pset_dropdown_var.set("Select Property Set")
-            else:
-                pset_dropdown['values'] = []
-                pset_dropdown_var.set("Select Property Set")
-        else:
-            pset_dropdown['values'] = []
-            pset_dropdown_var.set("Select Property Set")
+        course = None
+        current_model()
+        if course_name != "Select Technique" and model_index is not None:
+            course = model_index.courses_by_name(zone).get(course_name)
+        pset_dropdown['values'] = model_index.pset_names(course) if course else []
+        pset_dropdown_var.set("Select Property Set")
 
     technique_dropdown.bind("<<ComboboxSelected>>", on_technique_select)
 
+    def append_status(lines):
+        # One insert per batch, then trim the box to its last STATUS_MAX_LINES lines
+        status_text.configure(state="normal")
+        status_text.insert("end", "".join(line + "\n" for line in lines))
+        excess = int(status_text.index("end-1c").split(".")[0]) - 1 - STATUS_MAX_LINES
+        if excess > 0:
+            status_text.delete("1.0", f"{excess + 1}.0")
+        status_text.see("end")
+        status_text.configure(state="disabled")
+
     def update_gui():
-        try:
-            for _ in range(10):  # Limit to 10 items per cycle
-                type_, data = update_queue.get_nowait()
-                if type_ == "status":
-                    status_text.configure(state="normal")
-                    status_text.insert("end", data + "\n")
-                    status_text.see("end")
-                    status_text.configure(state="disabled")
-                elif type_ == "progress":
-                    current, total = data
-                    percentage = (current / total) * 100
-                    progress_var.set(percentage)
-                    percentage_label.configure(text=f"{percentage:.1f}%")
-                elif type_ == "complete":
-                    log_file = data
-                    root.after(0, lambda: prompt_open_log(log_file))
-        except queue.Empty:
-            pass
-        if update_queue.qsize() > 100:
-            while not update_queue.empty():
-                try:
-                    update_queue.get_nowait()
-                except queue.Empty:
-                    break
+        progress, lines, skipped, events = status_channel.drain()
+        if skipped:
+            lines.insert(0, f"... {skipped} status lines skipped ...")
+        if lines:
+            append_status(lines)
+        if progress is not None:
+            current, total, info = progress
+            percentage = (current / total) * 100 if total else 100.0
+            progress_var.set(percentage)
+            percentage_label.configure(text=f"{percentage:.1f}%")
+            eta_label.configure(text=describe(info) if info else "")
+        for kind, data in events:
+            if kind == "complete":
+                root.after(0, lambda log_file=data: prompt_open_log(log_file))
+            elif kind == "cancelled":
+                root.after(0, lambda log_file=data: prompt_open_log(log_file, completed=False))
+            elif kind == "error":
+                root.after(0, lambda message=data: messagebox.showerror("Error", message, parent=root))
+            elif kind == "preview":
+                root.after(0, lambda plan_table=data: show_preview(plan_table))
+            elif kind == "finished":
+                run_button.configure(state="normal")
+                preview_button.configure(state="normal")
+                abort_button.configure(state="disabled")
         root.after(50, update_gui)
 
-    def run_mapping():
+    def run_mapping(preview=False):
         ifc_path = ifc_path_var.get()
         excel_path = excel_path_var.get()
         output_path = output_path_var.get()
-        if not ifc_path or not excel_path or not output_path:
+        log_level = mapper.LOG_LEVELS[log_level_var.get()]
+        share_values = share_values_var.get()
+        incremental_mode = incremental_var.get()
+        separate_process = separate_process_var.get()
+        patch_output = patch_output_var.get()
+        suggest = SUGGESTIONS_PER_ROW if suggest_var.get() else 0
+        compact = compact_var.get()
+        if not ifc_path or not excel_path or (not output_path and not preview):
             messagebox.showerror("Error", "Please select IFC, Excel, and output files.", parent=root)
             return
 
         run_button.configure(state="disabled")
+        preview_button.configure(state="disabled")
         abort_button.configure(state="normal")
         progress_var.set(0)
         percentage_label.configure(text="0.0%")
+        eta_label.configure(text="")
         status_text.configure(state="normal")
         status_text.delete("1.0", "end")
-        status_text.insert("end", "Starting mapping...\n")
+        status_text.insert("end", "Starting preview (nothing will be written)...\n" if preview else "Starting mapping...\n")
         status_text.configure(state="disabled")
         cancel_event.clear()
 
@@ -519,50 +463,99 @@ def start_gui():
         log_file = os.path.join(os.path.dirname(ifc_path), f"mapping_log_{timestamp}.txt")
 
         def mapping_thread():
+            nonlocal mapping_process
             try:
-                def update_progress(current, total):
+                def update_progress(current, total, info):
                     if not cancel_event.is_set():
-                        update_queue.put(("progress", (current, total)))
+                        status_channel.progress(current, total, info)
 
                 def update_status(message):
                     if not cancel_event.is_set():
-                        update_queue.put(("status", message))
+                        status_channel.status(message)
 
                 def complete_callback():
-                    update_queue.put(("complete", log_file))
-
-                mapper.run_mapping(ifc_path, excel_path, output_path, update_progress, update_status, cancel_event, log_file, complete_callback)
+                    if not preview:
+                        status_channel.event("complete", log_file)
+
+                if separate_process:
+                    # The model cache stays in this process; the worker parses its own copy
+                    mapping_process = worker.MappingProcess(ifc_path, excel_path, output_path, log_file, log_level=log_level, share_values=share_values, incremental_mode=incremental_mode, patch_output=patch_output, preview=preview, suggest=suggest, compact=compact)
+                    if cancel_event.is_set():
+                        mapping_process.abort()
+                    updated = mapping_process.run(update_progress, update_status, complete_callback)
+                else:
+                    updated = mapper.run_mapping(ifc_path, excel_path, output_path, update_progress, update_status, cancel_event, log_file, complete_callback, log_level=log_level, share_values=share_values, incremental_mode=incremental_mode, model_cache=model_cache, patch_output=patch_output, preview=preview, suggest=suggest, compact=compact)
+                if updated is None:
+                    status_channel.event("cancelled", log_file)
+                elif preview:
+                    status_channel.event("preview", updated)
             except Exception as e:
                 if not cancel_event.is_set():
-                    update_queue.put(("status", f"Error: {str(e)}"))
-                    root.after(0, lambda: messagebox.showerror("Error", str(e), parent=root))
+                    status_channel.status(f"Error: {str(e)}")
+                    status_channel.event("error", str(e))
             finally:
-                root.after(0, lambda: run_button.configure(state="normal"))
-                root.after(0, lambda: abort_button.configure(state="disabled"))
+                mapping_process = None
+                status_channel.event("finished")
 
         threading.Thread(target=mapping_thread, daemon=True).start()
 
-    def prompt_open_log(log_file):
-        if messagebox.askyesno("Open Log", "Mapping completed. Would you like to view the log file?", parent=root):
+    def prompt_open_log(log_file, completed=True):
+        question = "Mapping completed." if completed else "Mapping aborted."
+        if messagebox.askyesno("Open Log", f"{question} Would you like to view the log file?", parent=root):
             try:
                 subprocess.run(["notepad.exe", log_file], check=True)
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to open log file: {str(e)}", parent=root)
-        messagebox.showinfo("Success", "Mapping completed successfully!", parent=root)
+        if completed:
+            messagebox.showinfo("Success", "Mapping completed successfully!", parent=root)
+
+    def show_preview(plan_table):
+        """Per-zone counts of a preview run's match plan, with an export of the full plan."""
+        window = tk.Toplevel(root)
+        window.title("Mapping Preview")
+        window.geometry("800x400")
+        statuses = ["matched", "accepted", "unmatched_row", "unmatched_course", "invalid_row", "invalid_course", "cleared", "unknown_zone"]
+        tree = ttk.Treeview(window, columns=["zone"] + statuses, show="headings")
+        for column in ["zone"] + statuses:
+            tree.heading(column, text=column.replace("_", " ").capitalize())
+            tree.column(column, width=90, anchor="w" if column == "zone" else "e")
+        counts = plan_table.groupby(["zone", "status"]).size().unstack(fill_value=0).reindex(columns=statuses, fill_value=0)
+        for zone, row in counts.iterrows():
+            tree.insert("", "end", values=[zone] + [int(row[status]) for status in statuses])
+        tree.grid(row=0, column=0, sticky="nsew")
+        scrollbar = ttk.Scrollbar(window, orient="vertical", command=tree.yview)
+        scrollbar.grid(row=0, column=1, sticky="ns")
+        tree.configure(yscrollcommand=scrollbar.set)
+
+        def save_plan():
+            path = filedialog.asksaveasfilename(parent=window, defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
+            if path:
+                try:
+                    plan_table.to_csv(path, index=False, encoding="utf-8-sig")
+                except Exception as e:
+                    messagebox.showerror("Error", f"Failed to save match plan: {str(e)}", parent=window)
+
+        ttk.Button(window, text="Save Match Plan...", command=save_plan).grid(row=1, column=0, columnspan=2, pady=10)
+        window.columnconfigure(0, weight=1)
+        window.rowconfigure(0, weight=1)
 
     def cancel_mapping():
+        # The run stops at its next check; its "cancelled" event re-enables Run and offers the log
         cancel_event.set()
-        update_queue.put(("status", "Aborting mapping process..."))
-        run_button.configure(state="normal")
+        status_channel.status("Aborting mapping process...")
+        if mapping_process is not None:
+            mapping_process.abort()  # Kills the worker process at whatever stage it is in
         abort_button.configure(state="disabled")
-        root.after(0, lambda: prompt_open_log(log_file))
 
     run_button.configure(command=run_mapping)
+    preview_button.configure(command=lambda: run_mapping(preview=True))
     abort_button.configure(command=cancel_mapping)
     load_zones_button.configure(command=load_zones)
 
     root.after(50, update_gui)
     root.mainloop()
+    if mapping_process is not None:
+        mapping_process.abort()  # The worker is not daemonic; closing the window must not wait for it
 
 if __name__ == "__main__":
     start_gui()
\ No newline at end of file
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import time
+import zipfile
+from steppatch import PatchError, write_patched
+
+def is_compressed_path(path):
+    return path.lower().endswith(".ifczip")
+
+def _write(ifc_file, path, source_path, changes):
+    """Patch the source file when a ChangeSet allows it, otherwise serialize the whole model."""
+    if changes is not None and source_path and not is_compressed_path(source_path):
+        try:
+            write_patched(ifc_file, source_path, path, changes)
+            return True
+        except PatchError:
+            pass
+    ifc_file.write(path, format=".ifc")
+    return False
+
+def save_ifc(ifc_file, output_path, compress=None, source_path=None, changes=None):
+    """Write an IFC model atomically and return {"seconds", "bytes", "patched"}.
+
+    The model is written to a temporary '.part' file next to `output_path` and renamed over it
+    only once complete, so an interrupted save never leaves a truncated file behind. With
+    `compress` (by default: when the path ends in .ifcZIP) the output is an ifcZIP archive
+    holding a single .ifc entry.
+
+    Given the plain .ifc `source_path` the model was opened from and a ChangeSet of everything
+    changed since, the source is streamed through with only the changed entities rewritten,
+    which is much faster than re-serializing a large model. Files the patch writer cannot
+    handle are written in full.
+    """
+    start_time = time.perf_counter()
+    if compress is None:
+        compress = is_compressed_path(output_path)
+    directory = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(directory, exist_ok=True)
+    prefix = os.path.basename(output_path) + "."
+
+    fd, temp_path = tempfile.mkstemp(prefix=prefix, suffix=".part", dir=directory)
+    os.close(fd)
+    zip_path = None
+    try:
+        patched = _write(ifc_file, temp_path, source_path, changes)
+        if compress:
+            fd, zip_path = tempfile.mkstemp(prefix=prefix, suffix=".part", dir=directory)
+            os.close(fd)
+            entry_name = os.path.splitext(os.path.basename(output_path))[0] + ".ifc"
+            with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+                archive.write(temp_path, entry_name)
+            os.remove(temp_path)
+            temp_path, zip_path = zip_path, None
+        os.replace(temp_path, output_path)
+    except BaseException:
+        for path in (temp_path, zip_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+        raise
+    return {"seconds": time.perf_counter() - start_time, "bytes": os.path.getsize(output_path), "patched": patched}
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import time
+import pandas as pd
+from modelcache import model_key
+
+MANIFEST_VERSION = 2
+
+def manifest_path(ifc_path):
+    """Sidecar file recording what was mapped into `ifc_path`."""
+    return ifc_path + ".mapping.json"
+
+def _canonical(values):
+    text = values.astype(str)
+    blank = values.isna() | (text.str.strip() == "")
+    return text.where(~blank, "")
+
+def compute_state(df, technique_key, surface_key, value_columns):
+    """Content hashes of the mapped Excel rows: {zone: {"hash": ..., "rows": {key: row hash}}}.
+
+    A row's hash covers its zone, normalized match key and the values that get written. As in
+    the mapping itself, the last row wins when several rows share a key, and rows with an
+    empty key are ignored.
+    """
+    values = pd.DataFrame({c: _canonical(df[c]) for c in value_columns if c in df.columns}, index=df.index)
+    hashed = pd.concat([df[["ZONE", technique_key, surface_key]], values], axis=1)
+    rows = pd.DataFrame({
+        "zone": df["ZONE"],
+        "key": df[technique_key] + "\x1f" + df[surface_key],
+        "hash": pd.util.hash_pandas_object(hashed, index=False),
+    })
+    rows = rows[(df["ZONE"] != "") & (df[technique_key] != "") & (df[surface_key] != "")]
+    rows = rows.drop_duplicates(["zone", "key"], keep="last")
+
+    state = {}
+    for zone, key, row_hash in zip(rows["zone"], rows["key"], rows["hash"]):
+        state.setdefault(zone, {"rows": {}})["rows"][key] = int(row_hash)
+    for zone_state in state.values():
+        digest = hashlib.sha1()
+        for key in sorted(zone_state["rows"]):
+            digest.update(f"{key}={zone_state['rows'][key]}\n".encode("utf-8"))
+        zone_state["hash"] = digest.hexdigest()
+    return state
+
+def split_key(key):
+    technique_norm, surface_norm = key.split("\x1f", 1)
+    return technique_norm, surface_norm
+
+def diff_zone(previous, current):
+    """Keys of a zone whose rows were added or changed, and keys whose rows were removed."""
+    previous_rows = previous["rows"] if previous else {}
+    current_rows = current["rows"] if current else {}
+    changed = {key for key, row_hash in current_rows.items() if previous_rows.get(key) != row_hash}
+    removed = set(previous_rows) - set(current_rows)
+    return changed, removed
+
+def source_key(path):
+    """Record of the source IFC a mapping starts from, as stored in the manifest."""
+    return list(model_key(path))
+
+def load_previous(ifc_path, columns):
+    """Return (manifest, None) stored with `ifc_path`, or (None, reason) if unusable.
+
+    The manifest is only trusted if `ifc_path` is still exactly the file it was written for.
+    """
+    path = manifest_path(ifc_path)
+    if not os.path.exists(path):
+        return None, "no mapping manifest found next to the IFC file"
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        return None, f"unreadable mapping manifest ({e})"
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("columns") != list(columns):
+        return None, "mapping manifest was written by a different mapper version"
+    stat = os.stat(ifc_path)
+    if manifest.get("output") != {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}:
+        return None, "IFC file was modified after the mapping manifest was written"
+    return manifest, None
+
+def choose_source(ifc_path, output_path, columns):
+    """Pick the file an incremental run should start from.
+
+    That is `output_path` when it is a previous output with a valid manifest that was mapped
+    from `ifc_path` as it is now, else `ifc_path` when it is a previous output itself (picked
+    as input), else `ifc_path` for a full mapping. Returns (path, zones or None, source key to
+    record in the new manifest, reason the previous output cannot be used or None).
+    """
+    source = source_key(ifc_path)
+    reason = None
+    if output_path and os.path.exists(output_path) and not os.path.samefile(output_path, ifc_path):
+        manifest, reason = load_previous(output_path, columns)
+        if manifest is not None:
+            if manifest["source"] == source:
+                return output_path, manifest["zones"], manifest["source"], None
+            reason = f"{os.path.basename(ifc_path)} is not the IFC file {os.path.basename(output_path)} was mapped from, or it changed since"
+    manifest, why = load_previous(ifc_path, columns)
+    if manifest is not None:
+        return ifc_path, manifest["zones"], manifest["source"], None
+    return ifc_path, None, source, reason or why
+
+def write_manifest(output_path, excel_path, columns, state, source):
+    """Record what was mapped into `output_path`; `source` is the source_key of the original IFC."""
+    stat = os.stat(output_path)
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "source": source,
+        "excel": os.path.abspath(excel_path),
+        "columns": list(columns),
+        "output": {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns},
+        "zones": state,
+    }
+    temp_path = manifest_path(output_path) + ".part"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(temp_path, manifest_path(output_path))
@@ -1,6 +1,15 @@
-import gui
-#import gui_pyside6
+import multiprocessing
+import sys
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Worker processes of a frozen (PyInstaller) build start here
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        import service
+        sys.exit(service.main(sys.argv[2:]))
+    if len(sys.argv) > 1:
+        import cli
+        sys.exit(cli.main(sys.argv[1:]))
+    import gui
+    #import gui_pyside6
     gui.start_gui()
     #gui_pyside6.main()
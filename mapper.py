@@ -2,22 +2,127 @@ import ifcopenshell
 import pandas as pd
 import os
 import time
-import sys
 import threading
-from io import StringIO
+import queue
+import concurrent.futures
+import multiprocessing.connection
+from modelindex import ModelIndex
+from tableloader import load_table
+from addproperty import set_properties, remove_orphan_properties
+from ifcio import save_ifc
+from steppatch import ChangeSet
+from suggest import KeyIndex, is_confident
+import incremental
+from metrics import MetricsRecorder, entity_high_water, write_report
+from progress import ProgressTracker
+
+# Log verbosity, from least to most detailed. Each level includes the ones before it.
+LOG_SUMMARY = 0     # run start/end, totals and global warnings
+LOG_ZONE = 1        # one summary line per zone plus zone-level warnings
+LOG_ROW = 2         # every IfcCourse, Excel row and match
+LOG_COMPARISON = 3  # every key lookup with its raw and normalized values
+
+LOG_LEVELS = {
+    "summary": LOG_SUMMARY,
+    "zone": LOG_ZONE,
+    "row": LOG_ROW,
+    "comparison": LOG_COMPARISON,
+}
+
+class LogBuffer:
+    """Collects log lines in memory, e.g. inside a worker process, to be replayed into a LogWriter."""
+
+    def __init__(self, level=LOG_ZONE):
+        self.level = level
+        self.lines = []
+
+    def writeline(self, message):
+        self.lines.append(message)
+
+    def enabled(self, level):
+        return level <= self.level
+
+    def log(self, level, message, *args):
+        """Write a line if `level` is enabled. `args` are %-formatted into `message` only then."""
+        if level > self.level:
+            return
+        if args:
+            message = message % args
+        self.writeline(message)
+
+class LogWriter(LogBuffer):
+    """Append log lines to a file from a background thread.
+
+    Lines are queued (the queue is bounded, so a slow disk throttles the producer instead of
+    growing memory) and written in batches through a single open file handle. The file is
+    opened here, so a bad path raises right away; a later write error is raised by the next
+    write, flush or close.
+    """
 
-class LogRedirector:
-    def __init__(self, log_file):
+    def __init__(self, log_file, level=LOG_ZONE, max_queued=10000, batch_size=1000):
+        super().__init__(level)
         self.log_file = log_file
-        self.buffer = StringIO()
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._closed = False
+        self._error = None
+        self._file = open(log_file, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        f = self._file
+        try:
+            while True:
+                batch = [self._queue.get()]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = batch[-1] is None
+                if self._error is None:
+                    try:
+                        f.write("".join(m for m in batch if m is not None))
+                        f.flush()
+                    except OSError as e:
+                        self._error = e  # Keep draining so producers never block on a full queue
+                for _ in batch:
+                    self._queue.task_done()
+                if stop:
+                    return
+        finally:
+            try:
+                f.close()
+            except OSError as e:
+                self._error = self._error or e
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise OSError(f"Could not write log file {self.log_file}: {self._error}") from self._error
 
     def write(self, message):
-        self.buffer.write(message)
-        with open(self.log_file, "a", encoding="utf-8") as f:
-            f.write(message)
+        self._raise_error()
+        if not self._closed:
+            self._queue.put(message)
+
+    def writeline(self, message):
+        self.write(message + "\n")
 
     def flush(self):
-        self.buffer.flush()
+        """Block until everything written so far has reached the log file."""
+        if not self._closed:
+            self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        """Flush pending lines and stop the writer thread. Safe to call more than once."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        self._raise_error()
 
 def normalize_string(s, is_numeric=False):
     """Normalize strings for comparison: lowercase, remove spaces, normalize slashes, and handle numeric formats."""
@@ -33,9 +138,288 @@ def normalize_string(s, is_numeric=False):
             pass
     return s
 
-def run_mapping(ifc_path, excel_path, output_path, progress_callback, status_callback, cancel_event, log_file, complete_callback):
-    sys.stdout = LogRedirector(log_file)
-    print(f"Mapping started at {time.strftime('%Y-%m-%d %H:%M:%S')}")
+def normalize_series(values, is_numeric=False):
+    """Vectorized normalize_string over a pandas Series; gives exactly the same strings."""
+    missing = values.isna()
+    s = values.astype(str).str.lower().str.strip()
+    s = s.str.replace(" ", "", regex=False).str.replace("/", "", regex=False).str.replace("\\", "", regex=False)
+    s = s.where(~missing, "")
+    if is_numeric:
+        # Plain whole numbers ("12", "+12", "12.00") are converted in bulk. Everything else that float()
+        # might still accept (decimals, exponents, "inf", very large integers) takes the scalar path so
+        # the float formatting stays identical to normalize_string.
+        plain = s.str.fullmatch(r"[+-]?\d+(\.0*)?")
+        numbers = pd.to_numeric(s.where(plain), errors="coerce")
+        whole = plain & (numbers.abs() < 2 ** 53)
+        if whole.any():
+            s = s.where(~whole, numbers[whole].astype("int64").astype(str))
+        rest = ~whole & (s != "")
+        if rest.any():
+            s[rest] = s[rest].map(lambda v: normalize_string(v, is_numeric=True))
+    return s
+
+# Columns read from the Excel sheet: the match keys, and the values copied into "Excel Layer Info"
+REQUIRED_COLUMNS = ["ZONE", "TECHNIQUE_", "SURFACE"]
+EXCEL_COLUMNS_TO_ADD = [
+    "PR_1", "PR_2", "FOND", "SURFACE", "TYPE_COUCH",
+    "CHANTIER", "ENTREPRISE", "DATE_MS", "N°_ORDRE",
+]
+
+TECHNIQUE_KEY = "_TECHNIQUE_KEY"
+SURFACE_KEY = "_SURFACE_KEY"
+
+def prepare_rows(df):
+    """Clean ZONE and add the normalized TECHNIQUE_/SURFACE match keys to the whole frame in place."""
+    if "ZONE" not in df:
+        raise KeyError("Excel file has no ZONE column")
+    df["ZONE"] = df["ZONE"].astype(str).str.strip().where(df["ZONE"].notna(), "")
+    df[TECHNIQUE_KEY] = normalize_series(df["TECHNIQUE_"]) if "TECHNIQUE_" in df else ""
+    df[SURFACE_KEY] = normalize_series(df["SURFACE"], is_numeric=True) if "SURFACE" in df else ""
+    return df
+
+def plan_zone(zone, course_keys, zone_rows, log_level=LOG_ZONE, removed_keys=(), preview=False, suggest=0, auto_accept=None):
+    """Match one zone's Excel rows to its courses without touching the IFC model.
+
+    `course_keys` holds a (GlobalId, Name, CodeName) tuple per IfcCourse of the zone and
+    `zone_rows` the zone's slice of a frame passed through prepare_rows. Only plain values go
+    in and out, so this can run in a worker process. Returns a dict with the properties to
+    write per course GlobalId ("updates"), the courses whose Excel data must be cleared because
+    their (technique, surface) key is in `removed_keys` ("clears"), the zone's counts and its
+    log lines. With `preview`, "outcomes" also lists a PREVIEW_COLUMNS tuple for every course
+    and row of the zone.
+
+    With `suggest`, up to that many near-matching course keys are looked up for every unmatched
+    row and listed in "suggestions" as SUGGESTION_COLUMNS tuples. A row whose best suggestion
+    scores at least `auto_accept` (0..1), ahead of the runner-up, is mapped onto those courses
+    unless another row matches them exactly.
+    """
+    log = LogBuffer(log_level)
+    outcomes = []
+
+    # Index courses by their normalized (technique, surface) key so each Excel row is resolved
+    # with a single lookup. Several courses may share a CodeName; a matching row updates all of them.
+    course_index = {}
+    for global_id, name, code_name in course_keys:
+        if code_name and " - " in code_name:
+            technique, surface = code_name.split(" - ", 1)
+            technique_norm = normalize_string(technique)
+            surface_norm = normalize_string(surface, is_numeric=True)
+            course_index.setdefault((technique_norm, surface_norm), []).append((global_id, name))
+            log.log(LOG_ROW, "IfcCourse '%s' (GlobalId: %s): CodeName='%s' (Technique='%s', Surface='%s')", name, global_id, code_name, technique_norm, surface_norm)
+        else:
+            log.log(LOG_ROW, "IfcCourse '%s' (GlobalId: %s): Invalid or missing CodeName='%s'", name, global_id, code_name)
+            if preview:
+                outcomes.append((zone, "invalid_course", global_id, name, code_name, "", "", None, None))
+
+    for (technique_norm, surface_norm), courses in course_index.items():
+        if len(courses) > 1:
+            log.log(LOG_ZONE, "Warning: %d IfcCourse elements in zone '%s' share CodeName '%s - %s'; matching rows will update all of them", len(courses), zone, technique_norm, surface_norm)
+
+    # Resolve rows against the index. When several rows hit the same key the last one wins,
+    # as the property set is rewritten for every match anyway.
+    matched_rows = {}
+    accepted_rows = {}
+    suggestions = []
+    key_index = None
+    for i, technique_norm, surface_norm in zip(zone_rows.index, zone_rows[TECHNIQUE_KEY], zone_rows[SURFACE_KEY]):
+        if not technique_norm or not surface_norm:
+            if log.enabled(LOG_ROW):
+                row = zone_rows.loc[i]
+                log.log(LOG_ROW, "Skipping row for zone '%s': Invalid TECHNIQUE_='%s' or SURFACE='%s'", zone, row.get("TECHNIQUE_", ""), row.get("SURFACE", ""))
+            if preview:
+                outcomes.append((zone, "invalid_row", None, None, None, technique_norm, surface_norm, i, None))
+            continue
+        if log.enabled(LOG_COMPARISON):
+            row = zone_rows.loc[i]
+            log.log(LOG_COMPARISON, "Excel row for zone '%s': TECHNIQUE_='%s', SURFACE='%s' (Normalized: Technique='%s', Surface='%s')", zone, row.get("TECHNIQUE_", ""), row.get("SURFACE", ""), technique_norm, surface_norm)
+
+        key = (technique_norm, surface_norm)
+        if key not in course_index:
+            log.log(LOG_ROW, "No match for row in zone '%s': TECHNIQUE_='%s', SURFACE='%s' has no IfcCourse with that CodeName", zone, technique_norm, surface_norm)
+            best = None
+            if suggest and course_index:
+                if key_index is None:
+                    key_index = KeyIndex(course_index)  # Built once per zone, only when a row misses
+                near = key_index.suggest(technique_norm, surface_norm, k=suggest)
+                accepted = is_confident(near, auto_accept)
+                for rank, (near_key, score) in enumerate(near, 1):
+                    names = "; ".join(str(name) for global_id, name in course_index[near_key])
+                    suggestions.append((zone, i, technique_norm, surface_norm, rank, near_key[0], near_key[1], round(score, 3), names, accepted and rank == 1))
+                    log.log(LOG_ROW, "Suggestion %d for row %s in zone '%s': CodeName '%s - %s' (score %.2f)", rank, i, zone, near_key[0], near_key[1], score)
+                if near:
+                    best = f"{near[0][0][0]} - {near[0][0][1]} ({near[0][1]:.2f})"
+                if accepted:
+                    log.log(LOG_ZONE, "Auto-accepted CodeName '%s - %s' (score %.2f) for row %s in zone '%s': TECHNIQUE_='%s', SURFACE='%s'", near[0][0][0], near[0][0][1], near[0][1], i, zone, technique_norm, surface_norm)
+                    accepted_rows[near[0][0]] = i
+                    continue
+            if preview:
+                outcomes.append((zone, "unmatched_row", None, None, None, technique_norm, surface_norm, i, best))
+            continue
+        if key in matched_rows:
+            log.log(LOG_ROW, "Warning: Excel row %s in zone '%s' overrides row %s for CodeName '%s - %s'", i, zone, matched_rows[key], technique_norm, surface_norm)
+        matched_rows[key] = i
+    # Exact matches win over auto-accepted suggestions for the same courses
+    accepted_keys = set()
+    for key, i in accepted_rows.items():
+        if key in matched_rows:
+            log.log(LOG_ROW, "Auto-accepted row %s in zone '%s' ignored: row %s matches CodeName '%s - %s' exactly", i, zone, matched_rows[key], key[0], key[1])
+        else:
+            matched_rows[key] = i
+            accepted_keys.add(key)
+
+    updates = {}
+    for key, i in matched_rows.items():
+        row = zone_rows.loc[i]
+        properties = {}
+        for col in EXCEL_COLUMNS_TO_ADD:
+            val = row.get(col)
+            if pd.notna(val) and str(val).strip() != "":
+                properties[col] = str(val)
+        for global_id, name in course_index[key]:
+            log.log(LOG_ROW, "MATCH! IfcCourse '%s' (GlobalId: %s) matched with Excel row %s: TECHNIQUE_='%s', SURFACE='%s'", name, global_id, i, row.get("TECHNIQUE_"), row.get("SURFACE"))
+            updates[global_id] = properties
+
+    clears = []
+    for key in removed_keys:
+        for global_id, name in course_index.get(tuple(key), ()):
+            if global_id not in updates:
+                log.log(LOG_ROW, "Clearing IfcCourse '%s' (GlobalId: %s): its Excel row was removed", name, global_id)
+                clears.append(global_id)
+
+    if preview:
+        code_names = {global_id: code_name for global_id, name, code_name in course_keys}
+        cleared = set(clears)
+        for key, courses in course_index.items():
+            for global_id, name in courses:
+                if key in matched_rows:
+                    status, row_index = ("accepted" if key in accepted_keys else "matched"), matched_rows[key]
+                else:
+                    status, row_index = ("cleared" if global_id in cleared else "unmatched_course"), None
+                outcomes.append((zone, status, global_id, name, code_names[global_id], key[0], key[1], row_index, None))
+
+    return {
+        "zone": zone,
+        "updates": updates,
+        "clears": clears,
+        "rows": len(zone_rows),
+        "valid_courses": sum(len(courses) for courses in course_index.values()),  # Only courses with a valid CodeName
+        "log": log.lines,
+        "outcomes": outcomes,
+        "suggestions": suggestions,
+        "accepted": len(accepted_keys),
+    }
+
+# Columns of the match plan returned by a preview run. status is one of matched, accepted (an
+# auto-accepted suggestion), unmatched_row, unmatched_course, invalid_row, invalid_course, cleared or
+# unknown_zone (no IfcRoadPart for the row's ZONE). excel_row is the row's index in the loaded table
+# (0 for the first row below the header). suggestion is an unmatched row's best near match, if any.
+PREVIEW_COLUMNS = ["zone", "status", "global_id", "course", "code_name", "technique", "surface", "excel_row", "suggestion"]
+
+# Columns of the near-match report, one line per suggestion; accepted marks auto-accepted ones
+SUGGESTION_COLUMNS = ["zone", "excel_row", "technique", "surface", "rank", "suggested_technique", "suggested_surface", "score", "courses", "accepted"]
+
+def suggestions_path(output_path):
+    return os.path.splitext(output_path)[0] + "_suggestions.csv"
+
+# Rough cost of each stage per unit of work, from benchmark.py runs. They only weight the
+# progress bar and the ETA, so their ratios matter more than their values.
+IFC_LOAD_SECONDS_PER_BYTE = 2.5e-7  # Parsing and zone discovery
+TABLE_LOAD_SECONDS_PER_BYTE = 3e-6  # xlsx; csv and parquet load faster
+MATCH_SECONDS_PER_ROW = 1.5e-4
+WRITE_SECONDS_PER_COURSE = 2e-4
+COMPACT_SECONDS_PER_BYTE = 1e-7  # Per byte of the input file
+SAVE_SECONDS_PER_BYTE = 1.5e-7  # Per byte of the input file
+
+# Below this many Excel rows, starting worker processes costs more than matching in-process
+PARALLEL_MIN_ROWS = 20000
+
+def _exit_with_parent():
+    """Pool initializer: end this zone worker as soon as the process that started it is gone.
+
+    A killed mapping process (MappingProcess.abort, a terminated CLI job) cannot shut its pool
+    down, and on Windows nothing else would stop the orphaned workers.
+    """
+    parent = multiprocessing.parent_process()
+    if parent is None:
+        return
+
+    def watch():
+        multiprocessing.connection.wait([parent.sentinel])
+        os._exit(1)
+
+    threading.Thread(target=watch, daemon=True).start()
+
+def plan_workers(workers, zone_count, row_count):
+    """Number of processes to plan zones with; None picks one per CPU for large inputs."""
+    if workers is None:
+        workers = (os.cpu_count() or 1) if row_count >= PARALLEL_MIN_ROWS else 1
+    return max(1, min(workers, zone_count))
+
+def run_mapping(ifc_path, excel_path, output_path, progress_callback, status_callback, cancel_event, log_file, complete_callback, log_level=LOG_ZONE, workers=None, share_values=False, incremental_mode=False, model_cache=None, metrics_callback=None, trace_memory=False, patch_output=False, preview=False, suggest=0, auto_accept=None, compact=False):
+    """Map Excel rows onto the IfcCourse elements of an IFC file and save the result.
+
+    Returns the number of updated IfcCourse elements, or None when the run was cancelled.
+    progress_callback(done, total, info) reports the run's progress weighted by the work of
+    every stage, from parsing to saving; see progress.ProgressTracker.
+    With preview, only zone discovery, CodeName extraction and matching run: nothing is
+    written to the model or to disk (output_path may be None) and the match plan is returned
+    as a DataFrame with PREVIEW_COLUMNS, one row per course and per unmatched Excel row.
+    Zones are matched in up to `workers` processes (None: automatic) and the results applied
+    to the model on this thread. With share_values, courses with identical Excel values share
+    the same property entities. An output path ending in .ifcZIP is saved compressed.
+    complete_callback fires once the file is saved and the log is closed.
+
+    Every run stores a manifest of row and zone content hashes next to the output. With
+    incremental_mode, the run starts from the previous output instead of `ifc_path` when that
+    output was mapped from `ifc_path` as it is now (see incremental.choose_source) and only
+    touches courses whose Excel rows changed, were added or were removed since then. Otherwise
+    the run maps everything from `ifc_path`.
+
+    With a `model_cache` (ModelCache) the input model is taken from the cache when possible
+    and the mapped model is cached under the output file once saved.
+
+    Wall time, CPU time and peak memory of every stage, and the run's counts, are written to
+    '<output>.metrics.json' after a successful run and passed to metrics_callback (if given)
+    whatever the outcome. trace_memory adds tracemalloc peaks per stage.
+
+    With patch_output the output is written by streaming the input file through and rewriting
+    only the entities the mapping changed, instead of serializing the whole model.
+
+    With `suggest`, the closest course CodeNames of every unmatched Excel row are looked up
+    (see plan_zone) and written to '<output>_suggestions.csv'; rows whose best suggestion
+    scores at least `auto_accept` are mapped onto it.
+
+    Properties replaced by the mapping are removed from the file. With `compact`, property
+    sets and properties that nothing references (left behind by earlier tools or versions)
+    are removed as well before saving.
+    """
+    log = LogWriter(log_file, level=log_level)
+    metrics = MetricsRecorder(trace_memory=trace_memory)
+    status = "failed"
+    try:
+        updated = _run_mapping(ifc_path, excel_path, output_path, progress_callback, status_callback, cancel_event, log, workers, share_values, incremental_mode, model_cache, metrics, patch_output, preview, suggest, auto_accept, compact)
+        status = "cancelled" if updated is None else "completed"
+    finally:
+        metrics.close()
+        report = metrics.report(status=status, ifc=ifc_path, excel=excel_path, output=output_path)
+        if metrics_callback is not None:
+            metrics_callback(report)
+        try:
+            for name, stage in report["stages"].items():
+                log.log(LOG_SUMMARY, "Stage %s: %.2f s wall, %.2f s CPU", name, stage["wall_seconds"], stage["cpu_seconds"])
+            if status == "completed" and not preview:
+                try:
+                    write_report(output_path, report)
+                except OSError as e:
+                    log.log(LOG_SUMMARY, "Warning: Could not write metrics report: %s", e)
+        finally:
+            log.close()  # Raises if the log file could not be written
+    if updated is not None:
+        complete_callback()
+    return updated
+
+def _run_mapping(ifc_path, excel_path, output_path, progress_callback, status_callback, cancel_event, log, workers, share_values, incremental_mode, model_cache, metrics, patch_output, preview, suggest, auto_accept, compact):
+    log.log(LOG_SUMMARY, f"Mapping started at {time.strftime('%Y-%m-%d %H:%M:%S')}")
 
     start_time = time.time()
     if not os.path.exists(ifc_path):
@@ -43,291 +427,304 @@ def run_mapping(ifc_path, excel_path, output_path, progress_callback, status_cal
     if not os.path.exists(excel_path):
         raise FileNotFoundError(f"Excel file not found at {excel_path}")
 
+    progress = ProgressTracker(progress_callback)
+    ifc_bytes = os.path.getsize(ifc_path)
+    progress.plan("ifc_load", ifc_bytes, IFC_LOAD_SECONDS_PER_BYTE)
+    progress.plan("excel_load", os.path.getsize(excel_path), TABLE_LOAD_SECONDS_PER_BYTE)
+    if compact and not preview:
+        progress.plan("compaction", ifc_bytes, COMPACT_SECONDS_PER_BYTE)
+    if not preview:
+        progress.plan("save", ifc_bytes, SAVE_SECONDS_PER_BYTE)
+
+    previous = None
+    source = incremental.source_key(ifc_path)
+    if incremental_mode:
+        ifc_path, previous, source, reason = incremental.choose_source(ifc_path, output_path, EXCEL_COLUMNS_TO_ADD)
+        if previous is None:
+            status_callback(f"Incremental mapping not possible: {reason}. Mapping all zones.")
+            log.log(LOG_SUMMARY, f"Incremental mapping not possible: {reason}. Mapping all zones.")
+        else:
+            status_callback(f"Incremental mapping: only Excel rows changed since {os.path.basename(ifc_path)} are applied")
+            log.log(LOG_SUMMARY, f"Incremental mapping: only Excel rows changed since {os.path.basename(ifc_path)} are applied")
+
     status_callback("Loading IFC and Excel files...")
     try:
-        ifc_file = ifcopenshell.open(ifc_path)
+        with metrics.stage("ifc_load"):
+            ifc_file = model_cache.checkout(ifc_path) if model_cache is not None else ifcopenshell.open(ifc_path)
         status_callback(f"Successfully loaded IFC file: {os.path.basename(ifc_path)}")
-        print(f"Successfully loaded IFC file: {os.path.basename(ifc_path)}")
+        log.log(LOG_SUMMARY, f"Successfully loaded IFC file: {os.path.basename(ifc_path)}")
     except Exception as e:
         raise Exception(f"Error loading IFC file: {e}")
 
     try:
-        df = pd.read_excel(excel_path)
+        with metrics.stage("excel_load"):
+            df = load_table(excel_path, REQUIRED_COLUMNS + EXCEL_COLUMNS_TO_ADD, required=REQUIRED_COLUMNS)
+        # Until the courses are known, assume one per row
+        progress.plan("matching", len(df), MATCH_SECONDS_PER_ROW, "rows")
+        if not preview:
+            progress.plan("property_writes", len(df), WRITE_SECONDS_PER_COURSE, "courses")
+        progress.finish("excel_load")
         status_callback(f"Successfully loaded Excel file: {os.path.basename(excel_path)}")
-        print(f"Successfully loaded Excel file: {os.path.basename(excel_path)}")
+        log.log(LOG_SUMMARY, f"Successfully loaded Excel file: {os.path.basename(excel_path)}")
     except Exception as e:
         raise Exception(f"Error loading Excel file: {e}")
 
-    def get_all_roadparts():
-        roadparts = []
-        corridors = ifc_file.by_type("IfcRoad") or ifc_file.by_type("IfcFacility")
-        if not corridors:
-            status_callback("Warning: No IfcRoad or IfcFacility found in IFC file.")
-            print("Warning: No IfcRoad or IfcFacility found in IFC file.")
-            return roadparts
-
-        for corridor in corridors:
-            print(f"Found corridor: '{getattr(corridor, 'Name', 'N/A')}' (GlobalId: {corridor.GlobalId})")
-            if hasattr(corridor, "IsDecomposedBy"):
-                for rel in corridor.IsDecomposedBy:
-                    if hasattr(rel, "RelatedObjects"):
-                        for baseline in rel.RelatedObjects:
-                            if baseline.is_a("IfcRoadPart") or baseline.is_a("IfcElementAssembly"):
-                                print(f"Found baseline: '{getattr(baseline, 'Name', 'N/A')}' (GlobalId: {baseline.GlobalId})")
-                                if hasattr(baseline, "IsDecomposedBy"):
-                                    for sub_rel in baseline.IsDecomposedBy:
-                                        if hasattr(sub_rel, "RelatedObjects"):
-                                            for region in sub_rel.RelatedObjects:
-                                                if (
-                                                    region.is_a("IfcRoadPart") and
-                                                    getattr(region, "PredefinedType", None) == "ROADSEGMENT" and
-                                                    getattr(region, "ObjectType", None) == "BaselineRegion"
-                                                ):
-                                                    roadparts.append(region)
-                                if hasattr(baseline, "ContainsElements"):
-                                    for sub_rel in baseline.ContainsElements:
-                                        if sub_rel.is_a("IfcRelContainedInSpatialStructure") and hasattr(sub_rel, "RelatedElements"):
-                                            for region in sub_rel.RelatedElements:
-                                                if (
-                                                    region.is_a("IfcRoadPart") and
-                                                    getattr(region, "PredefinedType", None) == "ROADSEGMENT" and
-                                                    getattr(region, "ObjectType", None) == "BaselineRegion"
-                                                ):
-                                                    roadparts.append(region)
-        return roadparts
-
-    roadparts = get_all_roadparts()
+    changes = ChangeSet(ifc_file) if patch_output and not preview else None
+
+    if not (ifc_file.by_type("IfcRoad") or ifc_file.by_type("IfcFacility")):
+        status_callback("Warning: No IfcRoad or IfcFacility found in IFC file.")
+        log.log(LOG_SUMMARY, "Warning: No IfcRoad or IfcFacility found in IFC file.")
+
+    with metrics.stage("zone_discovery"):
+        model_index = ModelIndex(ifc_file)
+    progress.finish("ifc_load")
+    roadparts = model_index.regions
     total_zones = len(roadparts)
+    metrics.set_count("zones", total_zones)
     status_callback(f"Found {total_zones} zones (IfcRoadPart with ROADSEGMENT and BaselineRegion)")
-    print(f"Found {total_zones} zones (IfcRoadPart with ROADSEGMENT and BaselineRegion)")
+    log.log(LOG_SUMMARY, f"Found {total_zones} zones (IfcRoadPart with ROADSEGMENT and BaselineRegion)")
     if total_zones == 0:
         status_callback("Warning: No matching IfcRoadPart elements found.")
-        print("Warning: No matching IfcRoadPart elements found.")
+        log.log(LOG_SUMMARY, "Warning: No matching IfcRoadPart elements found.")
 
-    zone_to_region = {str(rp.Name).strip(): rp for rp in roadparts if rp.Name}
+    zone_to_region = model_index.zone_to_region
     status_callback(f"Found {len(zone_to_region)} unique zone names")
-    print(f"Found {len(zone_to_region)} unique zone names: {', '.join(sorted(zone_to_region.keys()))}")
-
-    def get_property(element, pset_name, prop_name):
-        if not hasattr(element, "IsDefinedBy"):
-            return None
-        for definition in element.IsDefinedBy:
-            if hasattr(definition, "RelatingPropertyDefinition"):
-                if (
-                    definition.RelatingPropertyDefinition.is_a("IfcPropertySet")
-                    and definition.RelatingPropertyDefinition.Name == pset_name
-                ):
-                    for prop in definition.RelatingPropertyDefinition.HasProperties:
-                        if prop.Name == prop_name:
-                            if hasattr(prop, "NominalValue") and prop.NominalValue:
-                                return prop.NominalValue.wrappedValue if hasattr(prop.NominalValue, "wrappedValue") else prop.NominalValue
-                            return prop
-        return None
-
-    def ensure_property_set(element, pset_name):
-        for definition in element.IsDefinedBy:
-            if (
-                definition.RelatingPropertyDefinition.is_a("IfcPropertySet")
-                and definition.RelatingPropertyDefinition.Name == pset_name
-            ):
-                return definition.RelatingPropertyDefinition
-        pset = ifc_file.createIfcPropertySet(
-            GlobalId=ifcopenshell.guid.new(),
-            OwnerHistory=element.OwnerHistory,
-            Name=pset_name,
-            HasProperties=[],
-        )
-        ifc_file.createIfcRelDefinesByProperties(
-            GlobalId=ifcopenshell.guid.new(),
-            OwnerHistory=element.OwnerHistory,
-            RelatedObjects=[element],
-            RelatingPropertyDefinition=pset,
-        )
-        return pset
-
-    def find_course_elements_recursively(current_element, depth=0):
-        found_courses = []
-        if cancel_event.is_set():
-            return found_courses
-        if hasattr(current_element, "IsDecomposedBy"):
-            for rel in current_element.IsDecomposedBy:
-                if hasattr(rel, "RelatedObjects"):
-                    for obj in rel.RelatedObjects:
-                        if obj.is_a("IfcCourse"):
-                            found_courses.append(obj)
-                        elif obj.is_a("IfcPavement") or obj.is_a("IfcRoadPart") or obj.is_a("IfcElement"):
-                            found_courses.extend(find_course_elements_recursively(obj, depth + 1))
-        if hasattr(current_element, "ContainsElements"):
-            for rel in current_element.ContainsElements:
-                if rel.is_a("IfcRelContainedInSpatialStructure") and hasattr(rel, "RelatedElements"):
-                    for obj in rel.RelatedElements:
-                        if obj.is_a("IfcCourse"):
-                            found_courses.append(obj)
-                        elif obj.is_a("IfcPavement") or obj.is_a("IfcRoadPart") or obj.is_a("IfcElement"):
-                            found_courses.extend(find_course_elements_recursively(obj, depth + 1))
-        return found_courses
-
-    def process_zone(zone, region, zone_rows, excel_columns_to_add, updated_count, zone_start_time, total_zones_processed, total_zones):
-        matches = 0
-        courses_to_process = find_course_elements_recursively(region)
-        status_callback(f"Found {len(courses_to_process)} IfcCourse elements under zone '{zone}'")
-        print(f"Found {len(courses_to_process)} IfcCourse elements under zone '{zone}'")
-        if not courses_to_process:
-            status_callback(f"Completed zone {total_zones_processed}/{total_zones}: '{zone}' with 0 matches in {time.time() - zone_start_time:.2f} seconds")
-            return 0
-
-        course_info = []
-        for course in courses_to_process:
-            code_name = get_property(course, "Corridor Shape Information", "CodeName")
-            if code_name and " - " in str(code_name):
-                technique, surface = str(code_name).split(" - ", 1)
-                technique_norm = normalize_string(technique)
-                surface_norm = normalize_string(surface, is_numeric=True)
-                course_info.append((course, technique_norm, surface_norm))
-                print(f"IfcCourse '{course.Name}' (GlobalId: {course.GlobalId}): CodeName='{code_name}' (Technique='{technique_norm}', Surface='{surface_norm}')")
-            else:
-                print(f"IfcCourse '{course.Name}' (GlobalId: {course.GlobalId}): Invalid or missing CodeName='{code_name}'")
-                continue
-
-        for i, row in zone_rows.iterrows():
-            if cancel_event.is_set():
-                print(f"Mapping cancelled during processing for zone '{zone}'")
-                status_callback(f"Mapping cancelled during zone {total_zones_processed}/{total_zones}: '{zone}'")
-                return 0
-            technique = str(row.get("TECHNIQUE_", ""))
-            surface = str(row.get("SURFACE", ""))
-            if not technique or not surface:
-                print(f"Skipping row for zone '{zone}': Invalid TECHNIQUE_='{technique}' or SURFACE='{surface}'")
-                continue
-            technique_norm = normalize_string(technique)
-            surface_norm = normalize_string(surface, is_numeric=True)
-            print(f"Excel row for zone '{zone}': TECHNIQUE_='{technique}', SURFACE='{surface}' (Normalized: Technique='{technique_norm}', Surface='{surface_norm}')")
-
-            for course, course_technique_norm, course_surface_norm in course_info:
-                if technique_norm == course_technique_norm and surface_norm == course_surface_norm:
-                    print(f"MATCH! IfcCourse '{course.Name}' (GlobalId: {course.GlobalId}) matched with Excel row: TECHNIQUE_='{technique}', SURFACE='{surface}'")
-                    pset = ensure_property_set(course, "Excel Layer Info")
-                    pset.HasProperties = []
-
-                    def add_excel_property(prop_name_in_excel):
-                        if cancel_event.is_set():
-                            return
-                        val = row.get(prop_name_in_excel)
-                        if pd.notna(val) and str(val).strip() != "":
-                            prop = ifc_file.createIfcPropertySingleValue(
-                                prop_name_in_excel,
-                                None,
-                                ifc_file.create_entity("IfcText", str(val)),
-                                None,
-                            )
-                            pset.HasProperties = list(pset.HasProperties) + [prop]
-
-                    for col in excel_columns_to_add:
-                        add_excel_property(col)
-                    updated_count[0] += 1
-                    matches += 1
-                    break
-                else:
-                    print(f"No match for row in zone '{zone}': TECHNIQUE_='{technique_norm}', SURFACE='{surface_norm}' != CodeName='{course_technique_norm} - {course_surface_norm}'")
-
-        zone_time = time.time() - zone_start_time
-        status_callback(f"Completed zone {total_zones_processed}/{total_zones}: '{zone}' with {matches} matches in {zone_time:.2f} seconds")
-        print(f"Completed zone {total_zones_processed}/{total_zones}: '{zone}' with {matches} matches in {zone_time:.2f} seconds")
-        # Check if all IfcCourse elements were matched
-        valid_courses = len(course_info)  # Only count courses with valid CodeName
-        if matches == valid_courses:
-            print(f"Verification: All {matches} valid IfcCourse elements in zone '{zone}' were successfully matched.")
-            status_callback(f"Verification: All {matches} valid IfcCourse elements in zone '{zone}' matched.")
-        else:
-            print(f"Warning: Only {matches} of {valid_courses} valid IfcCourse elements in zone '{zone}' were matched. {valid_courses - matches} courses not updated.")
-            status_callback(f"Warning: Only {matches} of {valid_courses} valid IfcCourse elements in zone '{zone}' matched.")
-
-        return matches
+    log.log(LOG_SUMMARY, f"Found {len(zone_to_region)} unique zone names")
+    log.log(LOG_ZONE, "Zone names: %s", ", ".join(sorted(zone_to_region.keys())))
 
     updated = [0]
-    excel_columns_to_add = [
-        "PR_1", "PR_2", "FOND", "SURFACE", "TYPE_COUCH",
-        "CHANTIER", "ENTREPRISE", "DATE_MS", "N°_ORDRE",
-    ]
+    value_cache = {} if share_values else None
 
     status_callback("Starting data mapping process...")
-    print("Starting data mapping process...")
-    processed_zone_names = set()
+    log.log(LOG_SUMMARY, "Starting data mapping process...")
     total_rows = len(df)
+    metrics.set_count("rows", total_rows)
 
     if cancel_event.is_set():
         status_callback("Mapping cancelled before processing started.")
-        print("Mapping cancelled before processing started.")
-        return
+        log.log(LOG_SUMMARY, "Mapping cancelled before processing started.")
+        return None
 
-    df["ZONE"] = df["ZONE"].apply(lambda x: str(x).strip() if pd.notna(x) else "")
-    zone_groups = df.groupby("ZONE")
+    with metrics.stage("matching"):
+        prepare_rows(df)
+        zone_groups = df.groupby("ZONE")
+        state = incremental.compute_state(df, TECHNIQUE_KEY, SURFACE_KEY, EXCEL_COLUMNS_TO_ADD)
+    metrics.set_count("excel_zones", len(zone_groups))
     status_callback(f"Found {len(zone_groups)} zones in Excel with {total_rows} total rows")
-    print(f"Found {len(zone_groups)} zones in Excel with {total_rows} total rows")
-    for zone, count in zone_groups.size().items():
-        if zone in zone_to_region:
-            print(f"Zone '{zone}' has {count} Excel row(s)")
-
-    total_zones_processed = 0
-    for zone, zone_rows in zone_groups:
-        if cancel_event.is_set():
-            status_callback("Mapping cancelled during processing.")
-            print("Mapping cancelled during processing.")
-            return
+    log.log(LOG_SUMMARY, f"Found {len(zone_groups)} zones in Excel with {total_rows} total rows")
+
+    zone_rows_by_name = dict(iter(zone_groups))
+    if previous is not None:
+        # Zones that disappeared from the Excel file still need their courses cleared
+        for zone in previous:
+            zone_rows_by_name.setdefault(zone, df.iloc[:0])
+
+    # Extract plain (GlobalId, Name, CodeName) keys for every zone so matching can run away from the model
+    zone_jobs = []
+    code_names = None
+    unchanged_zones = 0
+    outcomes = []
+    suggestions = []
+    for zone, zone_rows in zone_rows_by_name.items():
         if not zone:
-            print("Skipping empty ZONE value")
+            log.log(LOG_ZONE, "Skipping empty ZONE value")
             continue
-
         region = zone_to_region.get(zone)
         if not region:
-            print(f"No IfcRoadPart found matching ZONE='{zone}'")
+            log.log(LOG_ZONE, "No IfcRoadPart found matching ZONE='%s'", zone)
+            if preview:
+                for i, technique_norm, surface_norm in zip(zone_rows.index, zone_rows[TECHNIQUE_KEY], zone_rows[SURFACE_KEY]):
+                    outcomes.append((zone, "unknown_zone", None, None, None, technique_norm, surface_norm, i, None))
             continue
-
-        if zone in processed_zone_names:
-            continue
-
+        removed_keys = ()
+        if previous is not None:
+            if previous.get(zone, {}).get("hash") == state.get(zone, {}).get("hash"):
+                log.log(LOG_ROW, "Zone '%s' is unchanged since the previous mapping", zone)
+                unchanged_zones += 1
+                continue
+            changed, removed = incremental.diff_zone(previous.get(zone), state.get(zone))
+            zone_rows = zone_rows[(zone_rows[TECHNIQUE_KEY] + "\x1f" + zone_rows[SURFACE_KEY]).isin(changed)]
+            removed_keys = [incremental.split_key(key) for key in removed]
+            log.log(LOG_ZONE, "Zone '%s': %d changed or added key(s), %d removed key(s)", zone, len(changed), len(removed))
+        courses = model_index.courses(region)
+        course_keys = []
+        with metrics.stage("course_traversal"):
+            if code_names is None:
+                code_names = model_index.property_values("Corridor Shape Information", "CodeName")
+            for course in courses:
+                code_name = code_names.get(course.id())
+                course_keys.append((course.GlobalId, course.Name, None if code_name is None else str(code_name)))
+        metrics.count("courses", len(courses))
+        log.log(LOG_ROW, "Zone '%s' (GlobalId: %s): %d Excel row(s), %d IfcCourse element(s)", zone, region.GlobalId, len(zone_rows), len(courses))
+        zone_jobs.append((zone, course_keys, zone_rows, removed_keys))
+
+    if previous is not None:
+        status_callback(f"{unchanged_zones} zones unchanged, {len(zone_jobs)} zones to update")
+        log.log(LOG_SUMMARY, f"{unchanged_zones} zones unchanged, {len(zone_jobs)} zones to update")
+        metrics.set_count("unchanged_zones", unchanged_zones)
+    metrics.set_count("mapped_zones", len(zone_jobs))
+    zone_courses = {zone: len(course_keys) for zone, course_keys, zone_rows, removed_keys in zone_jobs}
+    progress.plan("matching", sum(len(zone_rows) for zone, course_keys, zone_rows, removed_keys in zone_jobs), MATCH_SECONDS_PER_ROW, "rows")
+    if not preview:
+        progress.plan("property_writes", sum(zone_courses.values()), WRITE_SECONDS_PER_COURSE, "courses")
+
+    workers = plan_workers(workers, len(zone_jobs), total_rows)
+    if workers > 1:
+        status_callback(f"Matching {len(zone_jobs)} zones with {workers} worker processes")
+        log.log(LOG_SUMMARY, f"Matching {len(zone_jobs)} zones with {workers} worker processes")
+
+    def planned_zones():
+        if workers <= 1:
+            for zone, course_keys, zone_rows, removed_keys in zone_jobs:
+                yield plan_zone(zone, course_keys, zone_rows, log.level, removed_keys, preview, suggest, auto_accept)
+            return
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_exit_with_parent) as executor:
+            futures = [executor.submit(plan_zone, zone, course_keys, zone_rows, log.level, removed_keys, preview, suggest, auto_accept) for zone, course_keys, zone_rows, removed_keys in zone_jobs]
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    yield future.result()
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    if compact and not preview:
+        # Before any property is written: removals get slower the more entities were created
+        with metrics.stage("compaction"):
+            removed = remove_orphan_properties(ifc_file, changes=changes)
+        metrics.set_count("orphans_removed", sum(removed.values()))
+        summary = ", ".join(f"{count} {entity_type}" for entity_type, count in removed.items())
+        status_callback(f"Removed unreferenced property entities: {summary}")
+        log.log(LOG_SUMMARY, f"Removed unreferenced property entities: {summary}")
+        progress.finish("compaction")
+
+    # Apply each zone's plan as it arrives. All model mutations happen here, on this thread.
+    total_zones_processed = unchanged_zones
+    cleared = 0
+    first_new_entity = entity_high_water(ifc_file)
+    zone_start_time = time.time()
+    plans = planned_zones()
+    while True:
+        with metrics.stage("matching"):
+            plan = next(plans, None)  # Waits for the workers when matching in parallel
+        if plan is None:
+            break
+        if cancel_event.is_set():
+            status_callback("Mapping cancelled during processing.")
+            log.log(LOG_SUMMARY, "Mapping cancelled during processing.")
+            return None
+        zone = plan["zone"]
         total_zones_processed += 1
-        zone_start_time = time.time()
-        status_callback(f"Processing zone {total_zones_processed}/{total_zones}: '{getattr(region, 'Name', 'N/A')}'")
-        print(f"Processing zone {total_zones_processed}/{total_zones}: '{getattr(region, 'Name', 'N/A')}' (GlobalId: {region.GlobalId})")
+        for line in plan["log"]:
+            log.writeline(line)
+        suggestions.extend(plan["suggestions"])
+        progress.advance("matching", plan["rows"])
 
-        zone_thread = threading.Thread(
-            target=process_zone,
-            args=(zone, region, zone_rows, excel_columns_to_add, updated, zone_start_time, total_zones_processed, total_zones),
-            daemon=True
-        )
-        zone_thread.start()
-        zone_thread.join()
+        if preview:
+            outcomes.extend(plan["outcomes"])
+        else:
+            with metrics.stage("property_writes"):
+                for global_id, properties in plan["updates"].items():
+                    if cancel_event.is_set():
+                        log.log(LOG_SUMMARY, "Mapping cancelled during processing for zone '%s'", zone)
+                        status_callback(f"Mapping cancelled during zone {total_zones_processed}/{total_zones}: '{zone}'")
+                        return None
+                    course = ifc_file.by_guid(global_id)
+                    set_properties(ifc_file, course, "Excel Layer Info", properties, replace=True, value_cache=value_cache, index=model_index, changes=changes)
+                    updated[0] += 1
+                    progress.advance("property_writes")
+                for global_id in plan["clears"]:
+                    set_properties(ifc_file, ifc_file.by_guid(global_id), "Excel Layer Info", {}, replace=True, index=model_index, changes=changes)
+                    cleared += 1
+                    progress.advance("property_writes")
+            # Courses left alone are done too
+            progress.advance("property_writes", zone_courses[zone] - len(plan["updates"]) - len(plan["clears"]))
+
+        matches = len(plan["updates"])
+        valid_courses = plan["valid_courses"]
+        metrics.count("matches", matches)
+        metrics.count("valid_courses", valid_courses)
+        metrics.count("cleared", len(plan["clears"]))
+        if suggest:
+            metrics.count("suggested_rows", len({row[1] for row in plan["suggestions"]}))
+            metrics.count("auto_accepted", plan["accepted"])
+        metrics.set_count("entities_created", entity_high_water(ifc_file) - first_new_entity)
+        zone_time = time.time() - zone_start_time
+        zone_start_time = time.time()
+        status_callback(f"Completed zone {total_zones_processed}/{total_zones}: '{zone}' with {matches} matches in {zone_time:.2f} seconds")
+        log.log(LOG_ZONE, "Completed zone %d/%d: '%s' with %d matches (%d Excel rows, %d valid IfcCourse) in %.2f seconds", total_zones_processed, total_zones, zone, matches, plan["rows"], valid_courses, zone_time)
+        # Check if all IfcCourse elements were matched; an incremental run only sees changed rows
+        if previous is not None:
+            if plan["clears"]:
+                log.log(LOG_ZONE, "Cleared Excel data of %d IfcCourse elements in zone '%s'", len(plan["clears"]), zone)
+        elif matches == valid_courses:
+            log.log(LOG_ROW, "Verification: All %d valid IfcCourse elements in zone '%s' were successfully matched.", matches, zone)
+            status_callback(f"Verification: All {matches} valid IfcCourse elements in zone '{zone}' matched.")
+        else:
+            log.log(LOG_ZONE, "Warning: Only %d of %d valid IfcCourse elements in zone '%s' were matched. %d courses not updated.", matches, valid_courses, zone, valid_courses - matches)
+            status_callback(f"Warning: Only {matches} of {valid_courses} valid IfcCourse elements in zone '{zone}' matched.")
 
-        processed_zone_names.add(zone)
-        progress_callback(total_zones_processed, total_zones)
-        print(f"Updated progress: {total_zones_processed}/{total_zones} zones completed")
+        log.log(LOG_ROW, "Updated progress: %d/%d zones completed", total_zones_processed, total_zones)
 
     if cancel_event.is_set():
         status_callback("Mapping cancelled before saving.")
-        print("Mapping cancelled before saving.")
-        return
+        log.log(LOG_SUMMARY, "Mapping cancelled before saving.")
+        return None
 
-    def save_ifc_file():
+    if preview:
+        progress.finish("matching")
+        if model_cache is not None:
+            model_cache.checkin(ifc_file, ifc_path)  # Unmodified, so still a parse of the input
+        plan_table = pd.DataFrame(outcomes, columns=PREVIEW_COLUMNS)
+        plan_table["excel_row"] = plan_table["excel_row"].astype("Int64")
+        counts = plan_table["status"].value_counts()
+        summary = ", ".join(f"{counts[status]} {status.replace('_', ' ')}" for status in counts.index)
+        if suggestions:
+            status_callback(f"Found near matches for {len({(row[0], row[1]) for row in suggestions})} unmatched rows; see the suggestion column")
+        status_callback(f"Preview complete: {summary or 'nothing to map'}. Nothing was written.")
+        log.log(LOG_SUMMARY, f"Preview complete: {summary or 'nothing to map'}. Nothing was written.")
+        log.log(LOG_SUMMARY, f"Mapping finished at {time.strftime('%Y-%m-%d %H:%M:%S')}")
+        return plan_table
+
+    status_callback("Saving file...")
+    log.log(LOG_SUMMARY, "Saving file...")
+    try:
+        with metrics.stage("save"):
+            saved = save_ifc(ifc_file, output_path, source_path=ifc_path, changes=changes)
+        progress.finish("save")
+    except Exception as e:
+        status_callback(f"Error saving updated IFC file: {str(e)}")
+        log.log(LOG_SUMMARY, f"Error saving updated IFC file: {str(e)}")
+        raise
+    if model_cache is not None:
+        model_cache.checkin(ifc_file, output_path)
+    status_callback(f"Successfully updated {updated[0]} IfcCourse elements. Saved as {output_path}")
+    log.log(LOG_SUMMARY, f"Successfully updated {updated[0]} IfcCourse elements. Saved as {output_path}")
+    if cleared:
+        status_callback(f"Cleared Excel data of {cleared} IfcCourse elements whose rows were removed")
+        log.log(LOG_SUMMARY, f"Cleared Excel data of {cleared} IfcCourse elements whose rows were removed")
+    how = "patched from the input file" if saved["patched"] else "written in full"
+    if patch_output and not saved["patched"]:
+        how += " (the input file could not be patched)"
+    status_callback(f"Wrote {saved['bytes'] / 1e6:.1f} MB in {saved['seconds']:.2f} seconds, {how}")
+    log.log(LOG_SUMMARY, f"Wrote {saved['bytes']} bytes in {saved['seconds']:.2f} seconds, {how}")
+    try:
+        with metrics.stage("save"):
+            incremental.write_manifest(output_path, excel_path, EXCEL_COLUMNS_TO_ADD, state, source)
+    except OSError as e:
+        status_callback(f"Warning: Could not write mapping manifest: {e}")
+        log.log(LOG_SUMMARY, f"Warning: Could not write mapping manifest: {e}")
+    if suggest:
+        report_path = suggestions_path(output_path)
         try:
-            status_callback("Saving file...")
-            print("Saving file...")
-            time.sleep(2)  # Delay to ensure GUI updates
-            ifc_file.write(output_path)
-            status_callback(f"Successfully updated {updated[0]} IfcCourse elements. Saved as {output_path}")
-            print(f"Successfully updated {updated[0]} IfcCourse elements. Saved as {output_path}")
-            complete_callback()
-        except Exception as e:
-            status_callback(f"Error saving updated IFC file: {str(e)}")
-            print(f"Error saving updated IFC file: {str(e)}")
-            raise
-
-    save_thread = threading.Thread(target=save_ifc_file, daemon=True)
-    save_thread.start()
-    status_callback("IFC file save started in background...")
-
-    end_time = time.time()
-    runtime = end_time - start_time
+            pd.DataFrame(suggestions, columns=SUGGESTION_COLUMNS).to_csv(report_path, index=False)
+            rows = len({(row[0], row[1]) for row in suggestions})
+            status_callback(f"Wrote near-match suggestions for {rows} unmatched rows to {report_path}")
+            log.log(LOG_SUMMARY, f"Wrote near-match suggestions for {rows} unmatched rows to {report_path}")
+        except OSError as e:
+            status_callback(f"Warning: Could not write suggestion report: {e}")
+            log.log(LOG_SUMMARY, f"Warning: Could not write suggestion report: {e}")
+
+    runtime = time.time() - start_time
     status_callback(f"Total runtime: {runtime:.2f} seconds")
-    print(f"Total runtime: {runtime:.2f} seconds")
-    print(f"Mapping finished at {time.strftime('%Y-%m-%d %H:%M:%S')}")
\ No newline at end of file
+    log.log(LOG_SUMMARY, f"Total runtime: {runtime:.2f} seconds")
+    log.log(LOG_SUMMARY, f"Mapping finished at {time.strftime('%Y-%m-%d %H:%M:%S')}")
+    return updated[0]
@@ -0,0 +1,141 @@
+import os
+import threading
+from collections import OrderedDict
+import ifcopenshell
+
+# A parsed model takes roughly ten times its STEP file size in memory
+MEMORY_PER_FILE_BYTE = 10
+# Share of physical memory the cache may use by default, and the budget where that is unknown
+DEFAULT_MEMORY_SHARE = 0.5
+FALLBACK_BUDGET = 4 * 1024 ** 3
+
+def default_budget():
+    """Half of the physical memory, or FALLBACK_BUDGET where the platform does not report it."""
+    try:
+        memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return FALLBACK_BUDGET
+    return int(memory * DEFAULT_MEMORY_SHARE) if memory > 0 else FALLBACK_BUDGET
+
+def model_key(path):
+    """Cache key of the file currently at `path`; it changes whenever the file is rewritten."""
+    stat = os.stat(path)
+    return (os.path.normcase(os.path.abspath(path)), stat.st_size, stat.st_mtime_ns)
+
+class Lease:
+    """Shared access to a cached model, as held by the Add Property panel.
+
+    Call ModelCache.mark_dirty once the model has been edited. A clean lease may be revoked
+    when a mapping run takes over the model; its holder must then lease the file again.
+    """
+
+    def __init__(self, path, key, ifc_file):
+        self.path = path
+        self.key = key
+        self.ifc_file = ifc_file
+        self.dirty = False
+        self.revoked = False
+
+class _Entry:
+    def __init__(self, key, ifc_file):
+        self.key = key
+        self.ifc_file = ifc_file
+        self.cost = key[1] * MEMORY_PER_FILE_BYTE
+        self.leases = set()
+
+class ModelCache:
+    """Parsed IFC models keyed by (path, size, mtime), evicted least recently used first.
+
+    Parsing is the most expensive step on large models, so the panel and the mapping share
+    parses through this cache. The panel takes a shared `lease`. A mapping run, which modifies
+    its model, takes it over with `checkout`: a cached model is handed over (revoking clean
+    leases) unless a lease holds unsaved edits, in which case a fresh copy is parsed so those
+    edits are never touched. After saving, `checkin` caches the mapped model under the output
+    file's key. Models in use are never evicted; idle ones are once the estimated memory
+    exceeds `budget` bytes (by default half of the physical memory), except the most recently
+    used one, so a model larger than the budget is still kept for the next run.
+    """
+
+    def __init__(self, budget=None):
+        self.budget = budget if budget is not None else default_budget()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lease(self, path):
+        key = model_key(path)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            ifc_file = ifcopenshell.open(path)
+            with self._lock:
+                entry = self._entries.setdefault(key, _Entry(key, ifc_file))
+        with self._lock:
+            self._entries.move_to_end(key)
+            lease = Lease(path, key, entry.ifc_file)
+            entry.leases.add(lease)
+            self._evict()
+        return lease
+
+    def mark_dirty(self, lease):
+        lease.dirty = True
+
+    def mark_saved(self, lease, path):
+        """Record that a leased model was saved to `path`: it is now cached as that file, clean."""
+        key = model_key(path)
+        with self._lock:
+            entry = self._entries.pop(lease.key, None)
+            if entry is None or lease not in entry.leases:
+                lease.path, lease.key, lease.dirty = path, key, False
+                return
+            entry.key = key
+            entry.cost = key[1] * MEMORY_PER_FILE_BYTE
+            self._entries[key] = entry
+            for held in entry.leases:
+                held.path, held.key, held.dirty = path, key, False
+            self._evict()
+
+    def release(self, lease):
+        with self._lock:
+            entry = self._entries.get(lease.key)
+            if entry is None or lease not in entry.leases:
+                return
+            entry.leases.discard(lease)
+            if lease.dirty:
+                # The model no longer matches the file on disk
+                del self._entries[lease.key]
+            self._evict()
+
+    def checkout(self, path):
+        """Return a model of `path` that the caller owns and may modify."""
+        key = model_key(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not any(lease.dirty for lease in entry.leases):
+                del self._entries[key]
+                for lease in entry.leases:
+                    lease.revoked = True
+                return entry.ifc_file
+        return ifcopenshell.open(path)
+
+    def checkin(self, ifc_file, path):
+        """Cache a checked-out model that has just been saved to `path`."""
+        key = model_key(path)
+        with self._lock:
+            self._entries[key] = _Entry(key, ifc_file)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if not entry.leases]:
+                del self._entries[key]
+
+    def _evict(self):
+        total = sum(entry.cost for entry in self._entries.values())
+        for key in list(self._entries)[:-1]:
+            if total <= self.budget:
+                break
+            entry = self._entries[key]
+            if not entry.leases:
+                del self._entries[key]
+                total -= entry.cost
@@ -0,0 +1,142 @@
+def is_baseline_region(element):
+    """True for the IfcRoadPart elements that represent a mapping zone (ROADSEGMENT / BaselineRegion)."""
+    return (
+        element.is_a("IfcRoadPart") and
+        getattr(element, "PredefinedType", None) == "ROADSEGMENT" and
+        getattr(element, "ObjectType", None) == "BaselineRegion"
+    )
+
+def zone_name(region):
+    return str(getattr(region, "Name", "N/A")).strip()
+
+def _parent(element):
+    """The element this one is aggregated into or, failing that, contained in."""
+    for rel in getattr(element, "Decomposes", None) or ():
+        return rel.RelatingObject
+    for rel in getattr(element, "ContainedInStructure", None) or ():
+        return rel.RelatingStructure
+    return None
+
+def _property_value(pset, prop_name):
+    for prop in pset.HasProperties:
+        if prop.Name == prop_name:
+            nominal = getattr(prop, "NominalValue", None)
+            if nominal:
+                return getattr(nominal, "wrappedValue", nominal)
+            return prop
+    return None
+
+class ModelIndex:
+    """Zone and course lookups for an opened IFC file, built once.
+
+    Instead of walking the spatial tree down from every corridor, each IfcCourse climbs its
+    Decomposes / ContainedInStructure chain to the nearest BaselineRegion. Every ancestor's
+    region is memoized on the way, so shared parents are visited only once and the cost scales
+    with the number of courses rather than the size of the model.
+    """
+
+    def __init__(self, ifc_file):
+        self.ifc_file = ifc_file
+        self.regions = [rp for rp in ifc_file.by_type("IfcRoadPart") if is_baseline_region(rp)]
+        self.zone_to_region = {zone_name(rp): rp for rp in self.regions if rp.Name}
+        self._region_of = {}
+        self._courses_by_region = {rp.id(): [] for rp in self.regions}
+        self._courses_by_name = {}
+        self._psets = {}  # element id -> {pset name: IfcPropertySet}
+        self._values = {}  # (pset name, property name) -> {element id: value}
+        for course in ifc_file.by_type("IfcCourse"):
+            region = self._find_region(course)
+            if region is not None:
+                self._courses_by_region.setdefault(region.id(), []).append(course)
+                self._psets[course.id()] = {}
+
+        # One pass over the property relationships instead of an IsDefinedBy walk per course
+        for rel in ifc_file.by_type("IfcRelDefinesByProperties"):
+            pset = rel.RelatingPropertyDefinition
+            if not pset.is_a("IfcPropertySet"):
+                continue
+            for obj in rel.RelatedObjects:
+                psets = self._psets.get(obj.id())
+                if psets is not None:
+                    psets.setdefault(pset.Name, pset)
+
+    def _find_region(self, element):
+        path = []
+        seen = set()
+        region = None
+        current = _parent(element)
+        while current is not None and current.id() not in seen:
+            key = current.id()
+            if key in self._region_of:
+                region = self._region_of[key]
+                break
+            if is_baseline_region(current):
+                region = current
+                break
+            seen.add(key)
+            path.append(key)
+            current = _parent(current)
+        for key in path:
+            self._region_of[key] = region
+        return region
+
+    def courses(self, region):
+        """IfcCourse elements whose nearest BaselineRegion ancestor is `region`."""
+        return self._courses_by_region.get(region.id(), [])
+
+    def zone_courses(self, zone):
+        region = self.zone_to_region.get(zone)
+        return self.courses(region) if region is not None else []
+
+    def courses_by_name(self, zone):
+        """{Name: IfcCourse} for a zone; the first course wins when names repeat."""
+        if zone not in self._courses_by_name:
+            by_name = {}
+            for course in self.zone_courses(zone):
+                if course.Name:
+                    by_name.setdefault(course.Name, course)
+            self._courses_by_name[zone] = by_name
+        return self._courses_by_name[zone]
+
+    def _element_psets(self, element):
+        psets = self._psets.get(element.id())
+        if psets is None:
+            # Not an indexed course; index it on first use
+            psets = {}
+            for definition in getattr(element, "IsDefinedBy", None) or ():
+                if definition.is_a("IfcRelDefinesByProperties") and definition.RelatingPropertyDefinition.is_a("IfcPropertySet"):
+                    psets.setdefault(definition.RelatingPropertyDefinition.Name, definition.RelatingPropertyDefinition)
+            self._psets[element.id()] = psets
+        return psets
+
+    def pset_names(self, element):
+        return sorted(name for name in self._element_psets(element) if name)
+
+    def property_set(self, element, pset_name):
+        return self._element_psets(element).get(pset_name)
+
+    def property_values(self, pset_name, prop_name):
+        """{element id: value} of one property for every indexed element that has it.
+
+        Built from the indexed property sets on first use, reading each set once even when
+        several elements share it. Later edits to that property are not reflected.
+        """
+        key = (pset_name, prop_name)
+        values = self._values.get(key)
+        if values is None:
+            values = {}
+            by_pset = {}
+            for element_id, psets in self._psets.items():
+                pset = psets.get(pset_name)
+                if pset is None:
+                    continue
+                if pset.id() not in by_pset:
+                    by_pset[pset.id()] = _property_value(pset, prop_name)
+                if by_pset[pset.id()] is not None:
+                    values[element_id] = by_pset[pset.id()]
+            self._values[key] = values
+        return values
+
+    def add_property_set(self, element, pset):
+        """Record a property set created for `element` after the index was built."""
+        self._element_psets(element).setdefault(pset.Name, pset)
@@ -0,0 +1,129 @@
+import time
+from collections import deque
+
+# Shortest time between two progress reports; work done in between is reported together
+MIN_INTERVAL = 0.2
+# Seconds of recent history the throughput figures are averaged over
+RATE_WINDOW = 10.0
+
+def format_duration(seconds):
+    """'1:02:03' or '2:03' for a number of seconds."""
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+def describe(info):
+    """Stage, throughput and ETA of a progress report, e.g. 'property writes, 1,200 courses/s, ETA 3:12'."""
+    parts = [info["stage"].replace("_", " ")] if info["stage"] else []
+    parts += [f"{rate:,.0f} {unit}/s" for unit, rate in info["rates"].items()]
+    if info["eta"] is not None:
+        parts.append(f"ETA {format_duration(info['eta'])}")
+    return ", ".join(parts)
+
+class _Stage:
+    def __init__(self, total, cost, unit):
+        self.total = total
+        self.cost = cost
+        self.unit = unit
+        self.done = 0
+        self.samples = deque()  # (time, done) at each report, for the throughput
+
+class ProgressTracker:
+    """Progress of a run made of stages of uneven cost, with throughput and an ETA.
+
+    Every stage is planned with its amount of work (bytes, rows, courses) and an estimated cost
+    in seconds per unit, so it weighs what it is expected to take instead of counting as one
+    step. A stage can be planned again once its real size is known, and stages may advance
+    in any order or interleaved. Reports go to `callback(done, total, info)` at most every
+    `min_interval` seconds. done and total are estimated seconds. When a new plan makes the run
+    look longer or shorter, the reported progress carries on from where it was and spreads the
+    rest over the remaining work, so it never jumps back or stalls. info is a dict with the percent,
+    the current stage, the elapsed seconds, the ETA in seconds (None before any work is done)
+    and "rates", the recent throughput of every stage measured in a unit, such as
+    {"rows": 5000.0}.
+    """
+
+    def __init__(self, callback, min_interval=MIN_INTERVAL, window=RATE_WINDOW):
+        self.callback = callback
+        self.min_interval = min_interval
+        self.window = window
+        self.stages = {}
+        self.stage = None
+        self.start = time.monotonic()
+        self._last_report = None
+        self._fraction = 0.0
+        self._anchor = (0.0, 0.0)  # Reported fraction and estimated seconds done at the last plan change
+
+    def _work(self):
+        """(Estimated seconds of all planned work, estimated seconds done)."""
+        return (
+            sum(stage.total * stage.cost for stage in self.stages.values()),
+            sum(stage.done * stage.cost for stage in self.stages.values()),
+        )
+
+    def _fraction_of(self, total, done):
+        anchor_fraction, anchor_done = self._anchor
+        if total <= anchor_done:
+            return 1.0
+        fraction = anchor_fraction + (1 - anchor_fraction) * (done - anchor_done) / (total - anchor_done)
+        return min(max(self._fraction, fraction), 1.0)
+
+    def plan(self, name, total, cost, unit=None):
+        """Add a stage of `total` units costing `cost` seconds each, or update its estimate."""
+        planned, done = self._work()
+        if done:
+            self._fraction = self._fraction_of(planned, done)
+            self._anchor = (self._fraction, done)
+        stage = self.stages.get(name)
+        if stage is None:
+            self.stages[name] = _Stage(total, cost, unit)
+        else:
+            stage.total, stage.cost, stage.unit = total, cost, unit
+            stage.done = min(stage.done, total)
+
+    def advance(self, name, count=1):
+        stage = self.stages[name]
+        stage.done = min(stage.done + count, stage.total)
+        self.stage = name
+        self._report()
+
+    def finish(self, name):
+        """Mark a stage as complete and report at once."""
+        stage = self.stages[name]
+        stage.done = stage.total
+        self.stage = name
+        self._report(force=True)
+
+    def _report(self, force=False):
+        now = time.monotonic()
+        if not force and self._last_report is not None and now - self._last_report < self.min_interval:
+            return
+        self._last_report = now
+
+        total, done = self._work()
+        elapsed = now - self.start
+        # The ETA follows the work as currently planned, whatever was reported before
+        eta = elapsed * (total - done) / done if done else None
+        self._fraction = self._fraction_of(total, done)
+
+        rates = {}
+        for stage in self.stages.values():
+            if stage.unit is None:
+                continue
+            samples = stage.samples
+            samples.append((now, stage.done))
+            # Drop samples older than the window, and those from before the stage got going
+            while samples and (samples[0][0] < now - self.window or (len(samples) > 1 and samples[1][1] == samples[0][1])):
+                samples.popleft()
+            first_time, first_done = samples[0]
+            if now > first_time and stage.done > first_done:
+                rates[stage.unit] = (stage.done - first_done) / (now - first_time)
+
+        info = {
+            "percent": self._fraction * 100,
+            "stage": self.stage,
+            "elapsed": elapsed,
+            "eta": eta,
+            "rates": rates,
+        }
+        self.callback(self._fraction * total, total, info)
@@ -0,0 +1,296 @@
+import argparse
+import datetime
+import hmac
+import itertools
+import json
+import os
+import queue
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import mapper
+from modelcache import ModelCache
+
+DEFAULT_PORT = 8765
+# Finished jobs kept for status queries; older ones are forgotten
+MAX_FINISHED_JOBS = 100
+
+# Job options accepted over the API and the run_mapping argument each one sets
+OPTIONS = {
+    "log_level": "log_level",
+    "workers": "workers",
+    "share_values": "share_values",
+    "incremental": "incremental_mode",
+    "patch_output": "patch_output",
+    "preview": "preview",
+    "suggest": "suggest",
+    "auto_accept": "auto_accept",
+    "compact": "compact",
+}
+
+class Job:
+    def __init__(self, job_id, ifc_path, excel_path, output_path, log_file, options):
+        self.id = job_id
+        self.ifc_path = ifc_path
+        self.excel_path = excel_path
+        self.output_path = output_path
+        self.log_file = log_file
+        self.options = options
+        self.status = "queued"
+        self.progress = None  # Latest progress info: percent, stage, elapsed, eta, rates
+        self.messages = deque(maxlen=200)
+        self.updated = None
+        self.error = None
+        self.metrics = None
+        self.plan = None  # Match plan records of a preview job
+        self.cancel_event = threading.Event()
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "ifc": self.ifc_path,
+            "excel": self.excel_path,
+            "output": self.output_path,
+            "log_file": self.log_file,
+            "progress": self.progress,
+            "messages": list(self.messages),
+            "updated": self.updated,
+            "error": self.error,
+            "metrics": self.metrics,
+            "plan": self.plan,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+class MappingService:
+    """Runs submitted mapping jobs one at a time in a long-lived process.
+
+    Jobs share one ModelCache, so a model saved by one job (for instance the output an
+    incremental job updates next week) is reused without parsing, and the interpreter,
+    pandas and ifcopenshell are imported only once.
+    """
+
+    def __init__(self, model_cache=None):
+        self.model_cache = model_cache if model_cache is not None else ModelCache()
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._ids = itertools.count(1)
+        self._thread = threading.Thread(target=self._run_jobs, daemon=True)
+        self._thread.start()
+
+    def submit(self, request):
+        """Queue a job from a dict with ifc, excel, output and optional options.
+
+        The log file is always written next to the output; clients cannot choose its path.
+        """
+        missing = [key for key in ("ifc", "excel", "output") if not request.get(key)]
+        if missing:
+            raise ValueError(f"Missing job field(s): {', '.join(missing)}")
+        if "log_file" in request:
+            raise ValueError("log_file cannot be set; the log is written next to the output")
+        options = {}
+        for key, value in (request.get("options") or {}).items():
+            if key not in OPTIONS:
+                raise ValueError(f"Unknown option '{key}'")
+            if key == "log_level":
+                if value not in mapper.LOG_LEVELS:
+                    raise ValueError(f"log_level must be one of {', '.join(mapper.LOG_LEVELS)}")
+                value = mapper.LOG_LEVELS[value]
+            options[OPTIONS[key]] = value
+
+        with self._lock:
+            job_id = str(next(self._ids))
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            log_file = os.path.join(os.path.dirname(os.path.abspath(request["output"])), f"mapping_log_{timestamp}_job{job_id}.txt")
+            job = Job(job_id, request["ifc"], request["excel"], request["output"], log_file, options)
+            self.jobs[job_id] = job
+            self._forget_old_jobs()
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self.jobs.values())
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel_event.set()
+        return job
+
+    def shutdown(self):
+        for job in self.list():
+            job.cancel_event.set()
+        self._queue.put(None)
+        self._thread.join()
+
+    def _forget_old_jobs(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished is not None]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    def _run_jobs(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            if job.cancel_event.is_set():
+                job.status = "cancelled"
+                job.finished = time.time()
+                continue
+            job.status = "running"
+            job.started = time.time()
+
+            def metrics_callback(report, job=job):
+                job.metrics = report
+
+            try:
+                updated = mapper.run_mapping(
+                    job.ifc_path, job.excel_path, job.output_path,
+                    lambda current, total, info, job=job: setattr(job, "progress", info),
+                    job.messages.append, job.cancel_event, job.log_file, lambda: None,
+                    model_cache=self.model_cache, metrics_callback=metrics_callback, **job.options,
+                )
+                if updated is not None and job.options.get("preview"):
+                    job.plan = json.loads(updated.to_json(orient="records"))
+                    updated = int(updated["status"].isin(["matched", "accepted"]).sum())
+                job.updated = updated
+                job.status = "cancelled" if updated is None else "completed"
+            except Exception as e:
+                job.error = str(e)
+                job.status = "failed"
+            job.finished = time.time()
+
+class _Handler(BaseHTTPRequestHandler):
+    """POST /jobs, GET /jobs, GET /jobs/<id>, POST /jobs/<id>/cancel; JSON in and out.
+
+    Every request must carry the server's token as 'Authorization: Bearer <token>', and job
+    submissions must be sent as application/json. Browsers cannot send either from another
+    site without a CORS preflight, which this server never answers.
+    """
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _path_parts(self):
+        return [part for part in self.path.split("?", 1)[0].split("/") if part]
+
+    def _authorized(self):
+        scheme, _, token = (self.headers.get("Authorization") or "").partition(" ")
+        if scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode("utf-8"), self.server.token.encode("utf-8")):
+            return True
+        self._send(401, {"error": "Missing or wrong token"})
+        return False
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        service = self.server.service
+        parts = self._path_parts()
+        if parts == ["jobs"]:
+            self._send(200, [job.to_dict() for job in service.list()])
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = service.get(parts[1])
+            if job is None:
+                self._send(404, {"error": f"No job {parts[1]}"})
+            else:
+                self._send(200, job.to_dict())
+        else:
+            self._send(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        service = self.server.service
+        parts = self._path_parts()
+        if parts == ["jobs"]:
+            content_type = (self.headers.get("Content-Type") or "").split(";", 1)[0].strip().lower()
+            if content_type != "application/json":
+                self._send(415, {"error": "Jobs must be submitted as application/json"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(request, dict):
+                    raise ValueError("Expected a JSON object")
+                job = service.submit(request)
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+                return
+            self._send(202, job.to_dict())
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel":
+            job = service.cancel(parts[1])
+            if job is None:
+                self._send(404, {"error": f"No job {parts[1]}"})
+            else:
+                self._send(202, job.to_dict())
+        else:
+            self._send(404, {"error": "Not found"})
+
+    def log_message(self, format, *args):
+        pass  # Keep the console for job output
+
+def serve(host="127.0.0.1", port=DEFAULT_PORT, service=None, token=None):
+    """Create an HTTP server for a MappingService; call serve_forever() on the result.
+
+    Clients authenticate with `token`; a random one is generated when none is given and
+    is available as server.token.
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.service = service if service is not None else MappingService()
+    server.token = token or secrets.token_urlsafe(32)
+    return server
+
+def read_token(path):
+    with open(path, encoding="utf-8") as f:
+        token = f.read().strip()
+    if not token:
+        raise ValueError(f"Token file {path} is empty")
+    return token
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve IFC-Excel mapping jobs over a local HTTP API.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1, local only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--cache-mb", type=int, help="memory budget of the model cache in MB")
+    parser.add_argument("--token-file", help="file holding the token clients must send (default: a random token, printed at startup)")
+    args = parser.parse_args(argv)
+
+    try:
+        token = read_token(args.token_file) if args.token_file else None
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    model_cache = ModelCache(args.cache_mb * 1024 * 1024) if args.cache_mb else ModelCache()
+    server = serve(args.host, args.port, MappingService(model_cache), token=token)
+    print(f"Mapping service listening on http://{args.host}:{server.server_address[1]}", flush=True)
+    if not args.token_file:
+        print(f"Send 'Authorization: Bearer {server.token}' with every request", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+import threading
+from collections import deque
+
+class StatusChannel:
+    """Hands progress, status lines and control events from a worker thread to the GUI thread.
+
+    Progress is coalesced: only the latest value is kept. At most `max_lines` pending status
+    lines are kept (older ones are counted as skipped), since the GUI only shows that many
+    anyway. Control events such as completion are never dropped and are delivered in order,
+    after the status lines queued before them.
+    """
+
+    def __init__(self, max_lines=1000):
+        self._lock = threading.Lock()
+        self._progress = None
+        self._lines = deque(maxlen=max_lines)
+        self._skipped = 0
+        self._events = deque()
+
+    def progress(self, current, total, info=None):
+        with self._lock:
+            self._progress = (current, total, info)
+
+    def status(self, message):
+        with self._lock:
+            if len(self._lines) == self._lines.maxlen:
+                self._skipped += 1
+            self._lines.append(message)
+
+    def event(self, kind, data=None):
+        with self._lock:
+            self._events.append((kind, data))
+
+    def drain(self):
+        """Return (latest (current, total, info) or None, status lines, skipped line count, events) and reset."""
+        with self._lock:
+            progress, self._progress = self._progress, None
+            lines = list(self._lines)
+            self._lines.clear()
+            skipped, self._skipped = self._skipped, 0
+            events = list(self._events)
+            self._events.clear()
+        return progress, lines, skipped, events
@@ -0,0 +1,118 @@
+import re
+
+_STATEMENT_ID = re.compile(rb"\s*#(\d+)\s*=")
+
+def _statement_id(statement):
+    match = _STATEMENT_ID.match(statement)
+    return int(match.group(1)) if match else None
+
+class PatchError(Exception):
+    """The source file cannot be patched; write the whole model instead."""
+
+class ChangeSet:
+    """Entities created, modified or removed since `ifc_file` was opened from its source file.
+
+    Entities with ids above the source's highest id count as created. Writers that change
+    attributes of existing entities report them through modify(); removals through remove().
+    """
+
+    def __init__(self, ifc_file):
+        self.ifc_file = ifc_file
+        self.base_max_id = ifc_file.wrapped_data.getMaxId()
+        self.modified = set()
+        self.removed = set()
+
+    def modify(self, entity):
+        entity_id = entity.id()
+        if 0 < entity_id <= self.base_max_id:
+            self.modified.add(entity_id)
+
+    def remove(self, entity_id):
+        if 0 < entity_id <= self.base_max_id:
+            self.removed.add(entity_id)
+            self.modified.discard(entity_id)
+
+    def created(self):
+        """Entities created since opening, in id order."""
+        for entity_id in range(self.base_max_id + 1, self.ifc_file.wrapped_data.getMaxId() + 1):
+            try:
+                yield self.ifc_file.by_id(entity_id)
+            except RuntimeError:
+                continue  # Created and removed again
+
+def _split_statements(text):
+    """Split data that holds several ';'-terminated statements, honouring quoted strings."""
+    statements = []
+    start = 0
+    in_string = False
+    for i, byte in enumerate(text):
+        if byte == 0x27:  # '
+            in_string = not in_string  # An escaped '' toggles twice
+        elif byte == 0x3B and not in_string:  # ;
+            statements.append(text[start:i + 1])
+            start = i + 1
+    rest = text[start:]
+    if rest.strip():
+        raise PatchError("unterminated statement in DATA section")
+    return statements
+
+def write_patched(ifc_file, source_path, target_path, changes):
+    """Write `ifc_file` to `target_path` by streaming its unchanged source file.
+
+    Lines of unmodified entities are copied byte for byte; modified entities are re-serialized,
+    removed ones dropped and created ones appended just before the DATA section's ENDSEC.
+    Raises PatchError when the source does not have the expected layout, in which case
+    nothing useful has been written and the caller should fall back to ifc_file.write.
+    Returns the number of rewritten and appended entities.
+    """
+    pending_modified = set(changes.modified)
+    appended = 0
+    newline = None
+    section = "header"
+    pending = []
+    with open(source_path, "rb", buffering=1 << 20) as source, open(target_path, "wb", buffering=1 << 20) as target:
+        for line in source:
+            if newline is None:
+                newline = b"\r\n" if line.endswith(b"\r\n") else b"\n"
+            if section != "data":
+                target.write(line)
+                if section == "header" and line.strip().upper() == b"DATA;":
+                    section = "data"
+                continue
+
+            # A statement may span several lines; it is complete once it ends with ';' outside a string
+            pending.append(line)
+            statement = b"".join(pending) if len(pending) > 1 else line
+            stripped = statement.rstrip()
+            if stripped and (not stripped.endswith(b";") or statement.count(b"'") % 2):
+                continue
+            pending = []
+            if stripped.upper() == b"ENDSEC;":
+                for entity in changes.created():
+                    target.write(entity.to_string().encode("ascii") + b";" + newline)
+                    appended += 1
+                target.write(statement)
+                section = "trailer"
+                continue
+
+            parts = [stripped] if stripped.count(b";") <= 1 else _split_statements(stripped)
+            if len(parts) > 1 and not any(_statement_id(part) in changes.modified or _statement_id(part) in changes.removed for part in parts):
+                target.write(statement)
+                continue
+            for part in parts:
+                entity_id = _statement_id(part)
+                if entity_id in changes.removed:
+                    continue
+                if entity_id in pending_modified:
+                    target.write(changes.ifc_file.by_id(entity_id).to_string().encode("ascii") + b";" + newline)
+                    pending_modified.discard(entity_id)
+                elif len(parts) == 1:
+                    target.write(statement)
+                else:
+                    target.write(part.strip() + newline)
+
+    if section != "trailer":
+        raise PatchError("no DATA section found")
+    if pending_modified:
+        raise PatchError(f"{len(pending_modified)} modified entities not found in the source file")
+    return {"rewritten": len(changes.modified), "appended": appended}
@@ -0,0 +1,54 @@
+import difflib
+import heapq
+
+# Candidates re-scored with difflib per lookup, picked by shared trigrams
+CANDIDATES = 20
+
+def _text(technique, surface):
+    return f"{technique} - {surface}"
+
+def _grams(text, n=3):
+    padded = f"  {text} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+class KeyIndex:
+    """Trigram index over a zone's normalized (technique, surface) course keys.
+
+    A lookup only scores the keys sharing the most trigrams with the query, so suggesting
+    courses for an unmatched row costs about the same whatever the number of courses.
+    """
+
+    def __init__(self, keys):
+        self.keys = list(keys)
+        self._texts = [_text(*key) for key in self.keys]
+        self._postings = {}
+        for position, text in enumerate(self._texts):
+            for gram in _grams(text):
+                self._postings.setdefault(gram, []).append(position)
+
+    def suggest(self, technique, surface, k=3, min_score=0.5):
+        """Up to `k` (key, score) pairs for the closest keys, best first; scores are in 0..1."""
+        text = _text(technique, surface)
+        postings = [self._postings[gram] for gram in _grams(text) if gram in self._postings]
+        # Trigrams found in most keys (shared prefixes, separators) say little and cost the most
+        common = max(CANDIDATES, len(self.keys) // 2)
+        shared = {}
+        for positions in [p for p in postings if len(p) <= common] or postings:
+            for position in positions:
+                shared[position] = shared.get(position, 0) + 1
+        candidates = heapq.nlargest(CANDIDATES, shared, key=shared.get)
+        matcher = difflib.SequenceMatcher(None, "", text, autojunk=False)  # b is cached, so the query goes there
+        scored = []
+        for position in candidates:
+            matcher.set_seq1(self._texts[position])
+            score = matcher.ratio()
+            if score >= min_score:
+                scored.append((self.keys[position], score))
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[:k]
+
+def is_confident(suggestions, threshold):
+    """True when the best suggestion reaches `threshold` and is strictly better than the next."""
+    if threshold is None or not suggestions or suggestions[0][1] < threshold:
+        return False
+    return len(suggestions) == 1 or suggestions[1][1] < suggestions[0][1]
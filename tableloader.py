@@ -0,0 +1,77 @@
+import os
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+def load_table(path, columns, required=()):
+    """Load only `columns` from an .xlsx/.xlsm, .xls, .csv or .parquet file into a DataFrame.
+
+    Columns missing from the file are left out; a missing `required` column raises ValueError.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    wanted = list(dict.fromkeys(columns))
+    if ext in (".xlsx", ".xlsm"):
+        df = _read_xlsx(path, wanted)
+    elif ext == ".csv":
+        df = pd.read_csv(path, usecols=lambda c: c in wanted, encoding="utf-8-sig")
+    elif ext == ".parquet":
+        df = _read_parquet(path, wanted)
+    else:
+        df = pd.read_excel(path, usecols=lambda c: c in wanted)
+
+    missing = [c for c in required if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+    return df
+
+def _read_xlsx(path, columns):
+    """Stream the first sheet through openpyxl read-only mode, keeping only the wanted cells.
+
+    Cell values are converted the way pd.read_excel does (whole floats become ints, empty cells
+    become NaN), and the same TextParser does the type inference, so the frame matches a full
+    read_excel of those columns.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame(columns=[])
+        positions = {}
+        for position, name in enumerate(header):
+            if name is not None and str(name) in columns:
+                positions.setdefault(str(name), position)
+        names = [c for c in columns if c in positions]
+        indexes = [positions[c] for c in names]
+
+        data = [names]
+        for row in rows:
+            values = []
+            for i in indexes:
+                value = row[i] if i < len(row) else None
+                if value is None:
+                    value = ""
+                elif isinstance(value, float) and value.is_integer():
+                    value = int(value)
+                values.append(value)
+            data.append(values)
+    finally:
+        workbook.close()
+
+    # Trailing empty rows are dropped, as read_excel does
+    while len(data) > 1 and all(value == "" for value in data[-1]):
+        data.pop()
+    if not names:
+        return pd.DataFrame()
+    return TextParser(data, header=0).read()
+
+def _read_parquet(path, columns):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        df = pd.read_parquet(path)
+        return df[[c for c in columns if c in df.columns]]
+    available = set(pq.read_schema(path).names)
+    return pd.read_parquet(path, columns=[c for c in columns if c in available])
@@ -0,0 +1,51 @@
+import random
+import unittest
+import numpy as np
+import pandas as pd
+from mapper import normalize_series, normalize_string
+
+EDGE_CASES = [
+    None, np.nan, pd.NA, "", " ", "  12  ", "12", "+12", "-12", "012", "12.", "12.00", "12.50", ".5",
+    "1e3", "1E3", "1e-3", "-0", "0.0", "inf", "-inf", "nan", "Infinity", "9007199254740992",
+    "9007199254740993", "123456789012345678901234567890", "1 000", "1/2", "a\\b", "Enrobé / BB",
+    "BBSG 0/10", "ABC", "1_000", "0x10", 12, 12.0, 12.5, -3, 2 ** 60, 1e20, float("inf"), True,
+]
+
+def _random_value(rng):
+    kind = rng.randrange(6)
+    if kind == 0:
+        return rng.randint(-10 ** 6, 10 ** 6)
+    if kind == 1:
+        return round(rng.uniform(-1e4, 1e4), rng.randrange(4))
+    if kind == 2:
+        return None
+    if kind == 3:
+        sign = rng.choice(["", "+", "-", " "])
+        return f"{sign}{rng.randint(0, 10 ** 20)}{rng.choice(['', '.', '.0', '.000', '.25', 'e2'])}"
+    return "".join(rng.choice("0123456789.+-eE /\\abcABC") for _ in range(rng.randrange(1, 8)))
+
+class NormalizeSeriesTest(unittest.TestCase):
+    """normalize_series must give exactly the strings normalize_string gives value by value."""
+
+    def assert_equivalent(self, values):
+        series = pd.Series(values, dtype=object)
+        for is_numeric in (False, True):
+            expected = [normalize_string(value, is_numeric=is_numeric) for value in values]
+            actual = normalize_series(series, is_numeric=is_numeric).tolist()
+            for value, want, got in zip(values, expected, actual):
+                self.assertEqual(got, want, f"{value!r} (is_numeric={is_numeric})")
+
+    def test_edge_cases(self):
+        self.assert_equivalent(EDGE_CASES)
+
+    def test_numeric_column(self):
+        self.assert_equivalent([12.0, 7.5, np.nan, 3.0])
+        series = pd.Series([12.0, 7.5, np.nan, 3.0])
+        self.assertEqual(normalize_series(series, is_numeric=True).tolist(), ["12", "7.5", "", "3"])
+
+    def test_fuzz(self):
+        rng = random.Random(1234)
+        self.assert_equivalent([_random_value(rng) for _ in range(20000)])
+
+if __name__ == "__main__":
+    unittest.main()
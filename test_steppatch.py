@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+import ifcopenshell
+from steppatch import ChangeSet, PatchError, write_patched
+
+# Unchanged entities keep their exact text, so the source holds every layout write_patched must
+# handle: a statement over several lines, several statements on one line, and ';' inside strings.
+SOURCE = """ISO-10303-21;
+HEADER;
+FILE_DESCRIPTION(('ViewDefinition [CoordinationView]'),'2;1');
+FILE_NAME('source.ifc','2024-01-01T00:00:00',(''),(''),'','','');
+FILE_SCHEMA(('IFC4'));
+ENDSEC;
+DATA;
+#1=IFCPROPERTYSINGLEVALUE('A',$,IFCTEXT('a;1'),$);
+#2=IFCPROPERTYSINGLEVALUE('B',$,
+  IFCTEXT('b;2'),
+  $);
+#3=IFCPROPERTYSINGLEVALUE('C',$,IFCTEXT('it''s;3'),$);#4=IFCPROPERTYSINGLEVALUE('D',$,IFCTEXT('d'),$);
+#5=IFCPROPERTYSINGLEVALUE('E',$,IFCTEXT('e;5'),$);#6=IFCPROPERTYSINGLEVALUE('F',$,IFCTEXT('f'),$);
+#7=IFCPROPERTYSET('2O2Fr$t4X7Zf8NOew3FLOH',$,'Pset',$,(#1,#2,#3,#4,#5,#6));
+#8=IFCPROPERTYSINGLEVALUE('G',$,
+  IFCTEXT('g'),$);
+ENDSEC;
+END-ISO-10303-21;
+"""
+
+def _entities(path):
+    ifc_file = ifcopenshell.open(path)
+    return {entity.id(): entity.to_string() for entity in ifc_file}
+
+class WritePatchedTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.source = self.path("source.ifc")
+        with open(self.source, "w", newline="\r\n") as f:
+            f.write(SOURCE)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_round_trip(self):
+        ifc_file = ifcopenshell.open(self.source)
+        changes = ChangeSet(ifc_file)
+        # Modify a single-line statement and one of several statements on a line
+        for entity_id, value in ((1, "a;changed"), (3, "c';changed")):
+            prop = ifc_file.by_id(entity_id)
+            prop.NominalValue = ifc_file.createIfcText(value)
+            changes.modify(prop)
+        # Remove a statement sharing its line, and a multi-line one
+        pset = ifc_file.by_id(7)
+        for entity_id in (4, 8):
+            changes.remove(entity_id)
+            ifc_file.remove(ifc_file.by_id(entity_id))
+        # Create entities and reference them from an existing one
+        created = ifc_file.createIfcPropertySingleValue("H", None, ifc_file.createIfcText("h;new"), None)
+        pset.HasProperties = pset.HasProperties + (created,)
+        changes.modify(pset)
+
+        patched = self.path("patched.ifc")
+        written = self.path("written.ifc")
+        result = write_patched(ifc_file, self.source, patched, changes)
+        ifc_file.write(written)
+
+        self.assertEqual(_entities(patched), _entities(written))
+        self.assertEqual(result["rewritten"], 3)
+        with open(patched, "rb") as f:
+            text = f.read()
+        # Untouched statements are copied byte for byte
+        self.assertIn(b"#2=IFCPROPERTYSINGLEVALUE('B',$,\r\n  IFCTEXT('b;2'),\r\n  $);\r\n", text)
+        self.assertIn(b"#5=IFCPROPERTYSINGLEVALUE('E',$,IFCTEXT('e;5'),$);#6=IFCPROPERTYSINGLEVALUE('F',$,IFCTEXT('f'),$);\r\n", text)
+        self.assertNotIn(b"#4=", text)
+        self.assertNotIn(b"#8=", text)
+
+    def test_unchanged_copy(self):
+        ifc_file = ifcopenshell.open(self.source)
+        patched = self.path("patched.ifc")
+        write_patched(ifc_file, self.source, patched, ChangeSet(ifc_file))
+        with open(self.source, "rb") as source, open(patched, "rb") as target:
+            self.assertEqual(source.read(), target.read())
+
+    def test_modified_entity_missing_from_source(self):
+        ifc_file = ifcopenshell.open(self.source)
+        changes = ChangeSet(ifc_file)
+        changes.modify(ifc_file.by_id(1))
+        with open(self.source, "w", newline="\r\n") as f:
+            f.write(SOURCE.replace("#1=IFCPROPERTYSINGLEVALUE('A',$,IFCTEXT('a;1'),$);\n", ""))
+        with self.assertRaises(PatchError):
+            write_patched(ifc_file, self.source, self.path("patched.ifc"), changes)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import glob
+import multiprocessing
+import os
+import threading
+import mapper
+
+def remove_partial_outputs(output_path):
+    """Delete the temporary '.part' files an interrupted save of `output_path` may have left."""
+    directory = os.path.dirname(os.path.abspath(output_path))
+    pattern = os.path.join(glob.escape(directory), glob.escape(os.path.basename(output_path)) + ".*.part")
+    removed = []
+    for path in glob.glob(pattern):
+        try:
+            os.remove(path)
+            removed.append(path)
+        except OSError:
+            pass
+    return removed
+
+def _run_in_child(connection, args, options):
+    def send(kind, data=None):
+        connection.send((kind, data))
+
+    ifc_path, excel_path, output_path, log_file = args
+    try:
+        updated = mapper.run_mapping(
+            ifc_path, excel_path, output_path,
+            lambda current, total, info: send("progress", (current, total, info)),
+            lambda message: send("status", message),
+            threading.Event(), log_file, lambda: send("complete"),
+            metrics_callback=lambda report: send("metrics", report),
+            **options,
+        )
+        send("done", updated)
+    except Exception as e:
+        send("error", str(e))
+    finally:
+        connection.close()
+
+class MappingProcess:
+    """mapper.run_mapping in a separate process that can be killed at any point.
+
+    The child runs the whole pipeline and streams its callbacks back over a pipe, so the
+    caller's process (and its GIL) stays free for the UI. abort() terminates the child
+    immediately, even inside ifcopenshell.open or a save, and removes any temporary '.part'
+    files; as saves are atomic, the output file is then either untouched or complete. The
+    child is not daemonic, so it can start its own zone worker pool; those workers exit by
+    themselves once the child is gone.
+    `options` are passed on to run_mapping; a model_cache cannot cross the process boundary.
+    """
+
+    def __init__(self, ifc_path, excel_path, output_path, log_file, **options):
+        self.args = (ifc_path, excel_path, output_path, log_file)
+        self.output_path = output_path
+        self.options = options
+        self._process = None
+        self._aborted = threading.Event()
+
+    def run(self, progress_callback, status_callback, complete_callback, metrics_callback=None):
+        """Run the mapping and relay its callbacks on the calling thread until it ends.
+
+        Returns what run_mapping returned, or None if aborted. Errors in the child are raised
+        here as RuntimeError with the original message.
+        """
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        self._process = multiprocessing.Process(target=_run_in_child, args=(sender, self.args, self.options))
+        self._process.start()
+        sender.close()  # Only the child writes; EOF then means the child is gone
+        if self._aborted.is_set():
+            self._process.terminate()
+
+        done = False
+        updated = None
+        error = None
+        try:
+            while True:
+                try:
+                    kind, data = receiver.recv()
+                except EOFError:
+                    break
+                if kind == "progress":
+                    progress_callback(*data)
+                elif kind == "status":
+                    status_callback(data)
+                elif kind == "complete":
+                    complete_callback()
+                elif kind == "metrics":
+                    if metrics_callback is not None:
+                        metrics_callback(data)
+                elif kind == "done":
+                    done, updated = True, data
+                elif kind == "error":
+                    error = data
+        finally:
+            receiver.close()
+            self._process.join()
+
+        if done:
+            return updated
+        if self._aborted.is_set():
+            remove_partial_outputs(self.output_path)
+            return None
+        if error is not None:
+            raise RuntimeError(error)
+        remove_partial_outputs(self.output_path)
+        raise RuntimeError(f"Mapping process exited unexpectedly (exit code {self._process.exitcode})")
+
+    def abort(self):
+        self._aborted.set()
+        if self._process is not None and self._process.is_alive():
+            self._process.terminate()